@@ -0,0 +1,337 @@
+"""
+Batch/offline translation of many PDFs without the HTTP server
+
+Usage:
+    python batch.py INPUT_DIR_OR_MANIFEST -o OUTPUT_DIR [--langs kor_Hang,jpn_Jpan]
+
+INPUT may be a directory (searched recursively for *.pdf) or a manifest
+file with one PDF path per line ('#' starts a comment). Models are loaded
+once, OCR results are checkpointed, pages of several documents are
+translated together, and outputs that already exist are skipped.
+"""
+import os
+import argparse
+import hashlib
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+import sys
+sys.path.append(os.path.dirname(__file__))
+
+from config import (
+    DEFAULT_TARGET_LANG, SUPPORTED_TARGET_LANGS, BATCH_WINDOW_PAGES, BATCH_RENDER_WORKERS
+)
+from services.document import Page, pages_to_bytes, pages_from_bytes
+from services.ocr_service import OCRService
+from services.translation_service import TranslationService
+from services.pdf_generator import PDFGenerator
+from utils.budget import TimeBudget
+
+
+class BatchDocument:
+    """One input PDF and where its outputs go"""
+
+    __slots__ = ("input_path", "output_paths", "checkpoint_path", "pages")
+
+    def __init__(self, input_path: Path, output_paths: Dict[str, Path], checkpoint_path: Path):
+        self.input_path = input_path
+        self.output_paths = output_paths
+        self.checkpoint_path = checkpoint_path
+        self.pages: Optional[List[Page]] = None
+
+
+def collect_inputs(source: Path, exclude: Optional[Path] = None) -> List[tuple]:
+    """
+    Collect input PDFs from a directory or manifest
+
+    Args:
+        source: Directory or manifest file
+        exclude: Directory whose PDFs are never inputs (the output
+            directory, so translations aren't translated again)
+
+    Returns:
+        List of (input path, output name without extension)
+    """
+    if source.is_dir():
+        excluded = exclude.resolve() if exclude is not None else None
+        return [
+            (path, str(path.relative_to(source).with_suffix("")))
+            for path in sorted(source.rglob("*.pdf"))
+            if excluded is None or excluded not in path.resolve().parents
+        ]
+
+    inputs = []
+    base = source.parent
+    with open(source, encoding="utf-8") as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            path = Path(line)
+            if not path.is_absolute():
+                path = base / path
+            inputs.append((path, _manifest_output_name(path, base)))
+    return inputs
+
+
+def _manifest_output_name(path: Path, base: Path) -> str:
+    """Output name for a manifest entry, unique per input file"""
+    resolved = path.resolve()
+    try:
+        # Mirror the layout below the manifest's directory, like directory mode
+        return str(resolved.relative_to(base.resolve()).with_suffix(""))
+    except ValueError:
+        # Elsewhere, distinguish same-named files by a hash of their full path
+        digest = hashlib.sha1(str(resolved).encode("utf-8")).hexdigest()[:8]
+        return f"{path.stem}_{digest}"
+
+
+class BatchRunner:
+    """Multi-document OCR -> translation -> render pipeline"""
+
+    def __init__(
+        self,
+        output_dir: Path,
+        target_langs: List[str],
+        window_pages: int = BATCH_WINDOW_PAGES,
+        render_workers: int = BATCH_RENDER_WORKERS,
+        force: bool = False,
+    ):
+        self.output_dir = output_dir
+        self.checkpoint_dir = output_dir / ".checkpoints"
+        self.target_langs = target_langs
+        self.window_pages = window_pages
+        self.render_workers = render_workers
+        self.force = force
+
+        # Load models once for the whole run
+        self.ocr = OCRService()
+        self.translator = TranslationService()
+        self.generator = PDFGenerator()
+
+        self.stats = {
+            "documents_total": 0,
+            "documents_completed": 0,
+            "documents_skipped": 0,
+            "documents_failed": 0,
+            "pages": 0,
+            "pages_degraded": 0,
+            "ocr_seconds": 0.0,
+            "translation_seconds": 0.0,
+            "render_seconds": 0.0,
+            "failures": [],
+        }
+
+    def plan(self, inputs: List[tuple]) -> List[BatchDocument]:
+        """
+        Create documents to process, skipping already completed outputs
+
+        Raises:
+            ValueError: If two different inputs map to the same output name
+        """
+        names: Dict[str, Path] = {}
+        unique = []
+        for input_path, name in inputs:
+            other = names.get(name)
+            if other is None:
+                names[name] = input_path
+                unique.append((input_path, name))
+            elif other.resolve() != input_path.resolve():
+                raise ValueError(f"Inputs {other} and {input_path} would both be written as '{name}'")
+
+        documents = []
+        for input_path, name in unique:
+            self.stats["documents_total"] += 1
+            output_paths = {
+                lang: self.output_dir / f"{name}_{lang}.pdf" for lang in self.target_langs
+            }
+            if not self.force and all(p.exists() and p.stat().st_size > 0 for p in output_paths.values()):
+                self.stats["documents_skipped"] += 1
+                continue
+            checkpoint_path = self.checkpoint_dir / f"{name}.ocr.bin"
+            documents.append(BatchDocument(input_path, output_paths, checkpoint_path))
+        return documents
+
+    def run(self, documents: List[BatchDocument]):
+        """Process documents, translating pages of several documents per batch"""
+        window: List[BatchDocument] = []
+        window_pages = 0
+
+        with ThreadPoolExecutor(max_workers=self.render_workers) as render_pool:
+            pending = []
+            for doc in documents:
+                if not self._ocr(doc):
+                    continue
+                window.append(doc)
+                window_pages += len(doc.pages)
+                if window_pages >= self.window_pages:
+                    pending.extend(self._translate_and_render(window, render_pool))
+                    window, window_pages = [], 0
+
+                # Collect finished renders; block if rendering falls behind so
+                # translated pages don't pile up in memory
+                while pending and (pending[0][1].done() or len(pending) > self.render_workers * 4):
+                    self._wait_render(*pending.pop(0))
+
+            if window:
+                pending.extend(self._translate_and_render(window, render_pool))
+
+            for doc, future in pending:
+                self._wait_render(doc, future)
+
+    def _ocr(self, doc: BatchDocument) -> bool:
+        """Run OCR for a document, reusing a checkpoint if one exists"""
+        if not self.force and doc.checkpoint_path.exists():
+            try:
+                doc.pages = pages_from_bytes(doc.checkpoint_path.read_bytes())
+                print(f"Loaded OCR checkpoint: {doc.checkpoint_path}")
+            except (OSError, ValueError) as e:
+                # A corrupt checkpoint (e.g. from a crash) just means OCR again
+                print(f"Discarding invalid OCR checkpoint {doc.checkpoint_path}: {e}")
+                doc.checkpoint_path.unlink(missing_ok=True)
+
+        try:
+            if doc.pages is None:
+                start = time.perf_counter()
+                doc.pages = self.ocr.process_pdf(str(doc.input_path), TimeBudget())
+                self.stats["ocr_seconds"] += time.perf_counter() - start
+                doc.checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+                _atomic_write(doc.checkpoint_path, pages_to_bytes(doc.pages))
+            self.stats["pages"] += len(doc.pages)
+            return True
+        except Exception as e:
+            self._fail(doc, "ocr", e)
+            return False
+
+    def _translate_and_render(self, window: List[BatchDocument], render_pool):
+        """Translate all pages of a window in one pass, then queue rendering"""
+        all_pages = [page for doc in window for page in doc.pages]
+        print(f"Translating {len(all_pages)} pages from {len(window)} documents...")
+
+        start = time.perf_counter()
+        try:
+            translated = self.translator.translate_pages(all_pages, self.target_langs, TimeBudget())
+        except Exception as e:
+            for doc in window:
+                self._fail(doc, "translation", e)
+            return []
+        self.stats["translation_seconds"] += time.perf_counter() - start
+
+        pending = []
+        offset = 0
+        for doc in window:
+            count = len(doc.pages)
+            doc_pages = {lang: translated[lang][offset:offset + count] for lang in self.target_langs}
+            offset += count
+            # OCR pages are no longer needed once translated
+            doc.pages = None
+            pending.append((doc, render_pool.submit(self._render, doc, doc_pages)))
+        return pending
+
+    def _render(self, doc: BatchDocument, doc_pages: Dict[str, List[Page]]) -> tuple:
+        """
+        Render every language of a document (runs in the render pool)
+        
+        Returns:
+            (render seconds, number of pages that used a degraded path)
+        """
+        start = time.perf_counter()
+        budget = TimeBudget()
+        degraded = set()
+        for lang, output_path in doc.output_paths.items():
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = output_path.with_suffix(".pdf.tmp")
+            self.generator.generate_pdf(doc_pages[lang], str(tmp_path), lang, budget)
+            os.replace(tmp_path, output_path)
+            degraded.update(page.number for page in doc_pages[lang] if page.degradations)
+        return time.perf_counter() - start, len(degraded)
+
+    def _wait_render(self, doc: BatchDocument, future):
+        try:
+            render_seconds, pages_degraded = future.result()
+        except Exception as e:
+            self._fail(doc, "render", e)
+            return
+        self.stats["render_seconds"] += render_seconds
+        self.stats["pages_degraded"] += pages_degraded
+        self.stats["documents_completed"] += 1
+        try:
+            doc.checkpoint_path.unlink()
+        except OSError:
+            pass
+
+    def _fail(self, doc: BatchDocument, stage: str, e: Exception):
+        print(f"Failed ({stage}) {doc.input_path}: {e}")
+        self.stats["documents_failed"] += 1
+        self.stats["failures"].append({"input": str(doc.input_path), "stage": stage, "error": str(e)})
+
+    def report(self, wall_seconds: float) -> dict:
+        """Build the throughput report"""
+        report = dict(self.stats)
+        report["target_langs"] = self.target_langs
+        report["wall_seconds"] = round(wall_seconds, 2)
+        report["pages_per_second"] = round(self.stats["pages"] / wall_seconds, 3) if wall_seconds else 0.0
+        report["documents_per_hour"] = (
+            round(self.stats["documents_completed"] * 3600 / wall_seconds, 1) if wall_seconds else 0.0
+        )
+        for key in ("ocr_seconds", "translation_seconds", "render_seconds"):
+            report[key] = round(report[key], 2)
+        report["finished_at"] = datetime.now().isoformat()
+        return report
+
+
+def _atomic_write(path: Path, data: bytes):
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Translate a directory or manifest of PDFs")
+    parser.add_argument("input", type=Path, help="Directory of PDFs or manifest file (one path per line)")
+    parser.add_argument("-o", "--output-dir", type=Path, required=True, help="Directory for translated PDFs")
+    parser.add_argument("--langs", default=DEFAULT_TARGET_LANG,
+                        help="Comma-separated NLLB target language codes")
+    parser.add_argument("--window-pages", type=int, default=BATCH_WINDOW_PAGES,
+                        help="Pages from consecutive documents translated together")
+    parser.add_argument("--render-workers", type=int, default=BATCH_RENDER_WORKERS,
+                        help="Threads rendering PDFs while OCR continues")
+    parser.add_argument("--report", type=Path, help="Throughput report path (default: OUTPUT_DIR/batch_report.json)")
+    parser.add_argument("--force", action="store_true", help="Reprocess documents whose outputs exist")
+    args = parser.parse_args(argv)
+
+    langs = list(dict.fromkeys(lang.strip() for lang in args.langs.split(",") if lang.strip()))
+    unsupported = [lang for lang in langs if lang not in SUPPORTED_TARGET_LANGS]
+    if not langs or unsupported:
+        parser.error(f"Unsupported target language: {', '.join(unsupported) or args.langs}")
+    if not args.input.exists():
+        parser.error(f"Input not found: {args.input}")
+
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+    started = time.perf_counter()
+
+    runner = BatchRunner(args.output_dir, langs, args.window_pages, args.render_workers, args.force)
+    try:
+        documents = runner.plan(collect_inputs(args.input, exclude=args.output_dir))
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"{len(documents)} documents to process, {runner.stats['documents_skipped']} already completed")
+    runner.run(documents)
+
+    report = runner.report(time.perf_counter() - started)
+    report_path = args.report or args.output_dir / "batch_report.json"
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Report written: {report_path}")
+    print(f"{report['documents_completed']} completed, {report['documents_skipped']} skipped, "
+          f"{report['documents_failed']} failed, {report['pages_per_second']} pages/s")
+
+    return 1 if report["documents_failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
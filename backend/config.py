@@ -18,11 +18,25 @@ DEVICE_FORMULA = "gpu"
 
 # OCR settings
 DPI = 144  # Resolution for PDF to image conversion
+OCR_TEXT_REC_BATCH_SIZE = 4  # Fallback when device memory can't be measured
+OCR_TEXT_REC_MAX_BATCH_SIZE = 32
+OCR_TEXT_REC_BATCH_PER_GB = 2  # Text recognition batch items per GB of free GPU memory
 
 # Translation settings
 TRANSLATION_MODEL = "facebook/nllb-200-distilled-600M"  # NLLB English to Korean
 TRANSLATION_DEVICE = "cuda"  # Use GPU for translation
-TRANSLATION_BATCH_SIZE = 4  # Reduced for NLLB
+TRANSLATION_BATCH_SIZE = 4  # Initial batch size; adapted per sentence-length bucket
+TRANSLATION_MAX_BATCH_SIZE = 64  # Upper bound for adaptive batching
+TRANSLATION_NUM_BEAMS = None  # Beam search width; None keeps the model's generation_config (greedy is used when over time budget)
+DEFAULT_TARGET_LANG = "kor_Hang"
+# NLLB language codes that can be requested as translation targets
+SUPPORTED_TARGET_LANGS = {
+    "kor_Hang": "Korean",
+    "jpn_Jpan": "Japanese",
+    "zho_Hans": "Chinese (Simplified)",
+    "zho_Hant": "Chinese (Traditional)",
+}
+MAX_TARGET_LANGS_PER_JOB = 4
 
 # File upload settings
 MAX_UPLOAD_SIZE = 50 * 1024 * 1024  # 50MB
@@ -30,3 +44,32 @@ ALLOWED_EXTENSIONS = {".pdf"}
 
 # Processing settings
 CLEANUP_AFTER_HOURS = 24  # Clean up temp files after 24 hours
+CLEANUP_INTERVAL_SECONDS = 600  # How often the storage janitor runs
+DISK_QUOTA_BYTES = 10 * 1024 * 1024 * 1024  # 10GB across uploads and results (LRU eviction)
+FILE_CHUNK_SIZE = 1024 * 1024  # Chunk size for async upload/download I/O
+
+# Scheduling settings
+SCHEDULER_WORKERS = 1  # Concurrent job steps (models are shared, keep 1 per GPU)
+MAX_QUEUED_JOBS_PER_CLIENT = 10  # Per-client quota of queued/running jobs
+MAX_JOB_PRIORITY = 10  # Upload priority is clamped to [0, MAX_JOB_PRIORITY]
+TRUSTED_PROXIES = set()  # Peer addresses whose X-Client-ID header is trusted (e.g. {"127.0.0.1"})
+FAIR_SHARE_HALF_LIFE_SECONDS = 600  # Decay of per-client usage for fair share
+PRIORITY_AGING_SECONDS = 300  # Waiting this long raises a job's priority by one
+DEFAULT_SECONDS_PER_STEP = 2.0  # Initial ETA estimate per page step
+TRANSLATION_PAGES_PER_STEP = 4  # Pages translated per preemptible step
+
+# Batch (offline CLI) settings
+BATCH_WINDOW_PAGES = 64  # Pages from consecutive documents translated together
+BATCH_RENDER_WORKERS = 2  # Threads rendering PDFs while OCR continues
+
+# Time budgets and graceful degradation
+JOB_TIME_BUDGET_SECONDS = 30 * 60  # After this, all remaining pages use cheaper paths
+PAGE_TIME_BUDGET_SECONDS = 60  # Per page per stage (OCR, translation, rendering)
+DEGRADED_DPI = 96  # OCR resolution used when over budget
+FORMULA_RENDER_TIMEOUT_SECONDS = 10  # pdflatex/convert timeout per formula
+
+# Adaptive batch sizing
+BATCH_MEMORY_TARGET = 0.8  # Stop growing batches above this fraction of GPU (or host) memory
+BATCH_LATENCY_TARGET_SECONDS = 10  # Stop growing batches slower than this
+CPU_BATCH_SIZE_PER_THREAD = 2  # CPU mode: max batch size per available thread
+MIN_LENGTH_BUCKET = 32  # Smallest input-length bucket (characters)
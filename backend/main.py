@@ -1,20 +1,28 @@
 import os
-import uuid
 import asyncio
+import uuid
 from datetime import datetime
 from pathlib import Path
-from typing import Optional
-from fastapi import FastAPI, File, UploadFile, HTTPException
-from fastapi.responses import FileResponse, JSONResponse
+from typing import List, Optional
+from urllib.parse import quote
+from fastapi import FastAPI, File, Form, UploadFile, HTTPException, Request
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 import sys
 sys.path.append(os.path.dirname(__file__))
 
-from config import UPLOAD_DIR, RESULT_DIR, MAX_UPLOAD_SIZE, ALLOWED_EXTENSIONS
-from services.ocr_service import OCRService
+from config import (
+    UPLOAD_DIR, RESULT_DIR, MAX_UPLOAD_SIZE, ALLOWED_EXTENSIONS,
+    DEFAULT_TARGET_LANG, SUPPORTED_TARGET_LANGS, MAX_TARGET_LANGS_PER_JOB,
+    MAX_JOB_PRIORITY, TRANSLATION_PAGES_PER_STEP, TRUSTED_PROXIES
+)
+from services.ocr_service import OCRService, count_pdf_pages
 from services.translation_service import TranslationService
 from services.pdf_generator import PDFGenerator
+from services.scheduler import JobScheduler, Job, QueueFullError
+from utils.storage import StorageJanitor, save_upload, parse_range_header, iter_file_range, touch
+from utils.budget import TimeBudget
 
 # Initialize FastAPI app
 app = FastAPI(title="OCR Translation Service", version="1.0.0")
@@ -66,6 +74,72 @@ def get_pdf_generator():
     return pdf_generator
 
 
+def _task_id_from_path(path: Path) -> str:
+    """Extract task ID from an upload/result file name"""
+    return path.stem.split("_")[0]
+
+
+def _is_file_in_use(path: Path) -> bool:
+    """Files of tasks that are still being processed must not be evicted"""
+    task = tasks.get(_task_id_from_path(path))
+    return task is not None and task["status"] in ("uploaded", "processing")
+
+
+def _on_file_evicted(path: Path):
+    """Mark tasks whose result files were all removed as expired"""
+    task = tasks.get(_task_id_from_path(path))
+    if task is None:
+        return
+    result_paths = task.get("result_paths", {})
+    for lang, result_path in list(result_paths.items()):
+        if result_path == str(path):
+            del result_paths[lang]
+    if task.get("result_path") == str(path):
+        task.pop("result_path", None)
+        if result_paths:
+            task["result_path"] = next(iter(result_paths.values()))
+    if task["status"] == "completed" and not result_paths:
+        task["status"] = "expired"
+        task["message"] = "Result file expired and was removed"
+
+
+def _peer_address(request: Request) -> str:
+    return request.client.host if request.client else "anonymous"
+
+
+def _client_id(request: Request) -> str:
+    """Scheduler identity of a request: the peer address, or X-Client-ID from a trusted proxy"""
+    host = _peer_address(request)
+    if host in TRUSTED_PROXIES:
+        return request.headers.get("x-client-id") or host
+    return host
+
+
+def _job_priority(request: Request, requested: int) -> int:
+    """Priority is first in the scheduling order, so only trusted proxies may raise it"""
+    if _peer_address(request) not in TRUSTED_PROXIES:
+        return 0
+    return min(max(requested, 0), MAX_JOB_PRIORITY)
+
+
+storage_janitor = StorageJanitor(is_protected=_is_file_in_use, on_evict=_on_file_evicted)
+scheduler = JobScheduler()
+
+
+@app.on_event("startup")
+async def start_background_workers():
+    """Start job scheduler and background cleanup of temp files"""
+    scheduler.start()
+    storage_janitor.start()
+
+
+@app.on_event("shutdown")
+async def stop_background_workers():
+    """Stop job scheduler and background cleanup of temp files"""
+    await scheduler.stop()
+    await storage_janitor.stop()
+
+
 @app.get("/")
 async def root():
     """Serve frontend"""
@@ -85,40 +159,83 @@ async def health_check():
 
 
 @app.post("/api/upload")
-async def upload_pdf(file: UploadFile = File(...)):
+async def upload_pdf(
+    request: Request,
+    file: UploadFile = File(...),
+    target_langs: str = Form(DEFAULT_TARGET_LANG),
+    priority: int = Form(0)
+):
     """
     Upload PDF file for processing
     
+    target_langs is a comma-separated list of NLLB language codes
+    (e.g. "kor_Hang,jpn_Jpan"); OCR runs once and one PDF is produced per language.
+    The scheduler keys fair share and quotas on the client address.
+    X-Client-ID and priority (0..MAX_JOB_PRIORITY) are only honoured from
+    TRUSTED_PROXIES; everyone else gets priority 0.
+    
     Returns task_id for tracking progress
     """
     # Validate file
     if not file.filename.endswith('.pdf'):
         raise HTTPException(status_code=400, detail="Only PDF files are allowed")
     
-    # Check file size
-    content = await file.read()
-    if len(content) > MAX_UPLOAD_SIZE:
-        raise HTTPException(status_code=400, detail=f"File too large (max {MAX_UPLOAD_SIZE // 1024 // 1024}MB)")
+    # Validate target languages
+    langs = list(dict.fromkeys(lang.strip() for lang in target_langs.split(",") if lang.strip()))
+    if not langs:
+        langs = [DEFAULT_TARGET_LANG]
+    unsupported = [lang for lang in langs if lang not in SUPPORTED_TARGET_LANGS]
+    if unsupported:
+        raise HTTPException(status_code=400, detail=f"Unsupported target language: {', '.join(unsupported)}")
+    if len(langs) > MAX_TARGET_LANGS_PER_JOB:
+        raise HTTPException(status_code=400, detail=f"Too many target languages (max {MAX_TARGET_LANGS_PER_JOB})")
     
     # Generate task ID
     task_id = str(uuid.uuid4())
     
-    # Save uploaded file
+    # Save uploaded file (streamed, size checked while writing)
     upload_path = UPLOAD_DIR / f"{task_id}.pdf"
-    with open(upload_path, "wb") as f:
-        f.write(content)
+    if await save_upload(file, upload_path, MAX_UPLOAD_SIZE) < 0:
+        raise HTTPException(status_code=400, detail=f"File too large (max {MAX_UPLOAD_SIZE // 1024 // 1024}MB)")
+    
+    # Page count is the shortest-job-first hint
+    try:
+        num_pages = await asyncio.to_thread(count_pdf_pages, str(upload_path))
+    except Exception:
+        os.remove(upload_path)
+        raise HTTPException(status_code=400, detail="Invalid PDF file")
+    
+    client_id = _client_id(request)
+    priority = _job_priority(request, priority)
     
     # Create task
     tasks[task_id] = {
         "status": "uploaded",
         "progress": 0,
-        "message": "File uploaded successfully",
+        "message": "Queued for processing",
         "created_at": datetime.now().isoformat(),
-        "filename": file.filename
+        "filename": file.filename,
+        "target_langs": langs,
+        "num_pages": num_pages,
+        "priority": priority
     }
     
-    # Start processing in background
-    asyncio.create_task(process_pdf(task_id, str(upload_path)))
+    # Queue processing
+    job = Job(
+        task_id,
+        client_id,
+        process_pdf_steps(task_id, str(upload_path), langs),
+        num_pages=num_pages,
+        total_steps=estimate_steps(num_pages, langs),
+        priority=priority,
+        on_error=lambda e: mark_task_failed(task_id, e)
+    )
+    try:
+        scheduler.submit(job)
+    except QueueFullError as e:
+        del tasks[task_id]
+        os.remove(upload_path)
+        raise HTTPException(status_code=429, detail=str(e))
     
     return {
         "task_id": task_id,
@@ -128,77 +245,164 @@ async def upload_pdf(file: UploadFile = File(...)):
 
 @app.get("/api/status/{task_id}")
 async def get_status(task_id: str):
-    """Get processing status"""
+    """Get processing status, with queue position and ETA while scheduled"""
     if task_id not in tasks:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    return tasks[task_id]
+    status = dict(tasks[task_id])
+    queue_info = scheduler.queue_info(task_id)
+    if queue_info is not None:
+        status.update(queue_info)
+    return status
 
 
 @app.get("/api/download/{task_id}")
-async def download_result(task_id: str):
-    """Download translated PDF"""
+async def download_result(task_id: str, request: Request, lang: Optional[str] = None):
+    """
+    Download translated PDF
+    
+    lang selects the target language (defaults to the first one requested).
+    Supports single HTTP Range requests for resumable/partial downloads
+    """
     if task_id not in tasks:
         raise HTTPException(status_code=404, detail="Task not found")
     
     task = tasks[task_id]
     
+    if task["status"] == "expired":
+        raise HTTPException(status_code=410, detail=task["message"])
     if task["status"] != "completed":
         raise HTTPException(status_code=400, detail="Processing not completed yet")
     
-    result_path = task.get("result_path")
+    if lang is None:
+        result_path = task.get("result_path")
+    else:
+        result_path = task.get("result_paths", {}).get(lang)
     if not result_path or not os.path.exists(result_path):
         raise HTTPException(status_code=404, detail="Result file not found")
     
     original_filename = task.get("filename", "document.pdf")
-    translated_filename = f"translated_{original_filename}"
+    if lang is None:
+        translated_filename = f"translated_{original_filename}"
+    else:
+        translated_filename = f"translated_{lang}_{original_filename}"
+    
+    # Keep recently downloaded results at the back of the LRU eviction order
+    touch(result_path)
     
-    return FileResponse(
-        result_path,
+    file_size = os.path.getsize(result_path)
+    try:
+        byte_range = parse_range_header(request.headers.get("range"), file_size)
+    except ValueError:
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{file_size}"})
+    
+    if byte_range is None:
+        # Whole file: FileResponse uses the server's pathsend/zero-copy path when available
+        return FileResponse(
+            result_path,
+            media_type="application/pdf",
+            filename=translated_filename,
+            headers={"Accept-Ranges": "bytes"}
+        )
+    
+    start, end = byte_range
+    return StreamingResponse(
+        iter_file_range(result_path, start, end),
+        status_code=206,
         media_type="application/pdf",
-        filename=translated_filename
+        headers={
+            "Accept-Ranges": "bytes",
+            "Content-Range": f"bytes {start}-{end}/{file_size}",
+            "Content-Length": str(end - start + 1),
+            "Content-Disposition": f"attachment; filename*=utf-8''{quote(translated_filename)}",
+        }
     )
 
 
-async def process_pdf(task_id: str, pdf_path: str):
-    """Background task to process PDF"""
-    try:
-        # Update status
-        tasks[task_id]["status"] = "processing"
-        tasks[task_id]["progress"] = 10
-        tasks[task_id]["message"] = "Starting OCR..."
-        
-        # OCR
-        ocr = get_ocr_service()
-        pages_data = ocr.process_pdf(pdf_path)
-        
-        tasks[task_id]["progress"] = 40
-        tasks[task_id]["message"] = "OCR completed, starting translation..."
-        
-        # Translation
-        translator = get_translation_service()
-        for page_data in pages_data:
-            page_data["paragraphs"] = translator.translate_paragraphs(page_data["paragraphs"])
-        
-        tasks[task_id]["progress"] = 70
-        tasks[task_id]["message"] = "Translation completed, generating PDF..."
-        
-        # Generate PDF
-        generator = get_pdf_generator()
-        result_path = RESULT_DIR / f"{task_id}_translated.pdf"
-        generator.generate_pdf(pages_data, str(result_path))
-        
-        # Update task
-        tasks[task_id]["status"] = "completed"
-        tasks[task_id]["progress"] = 100
-        tasks[task_id]["message"] = "Processing completed successfully"
-        tasks[task_id]["result_path"] = str(result_path)
-        
-    except Exception as e:
-        print(f"Error processing PDF: {e}")
-        tasks[task_id]["status"] = "failed"
-        tasks[task_id]["message"] = f"Error: {str(e)}"
-        tasks[task_id]["error"] = str(e)
+def estimate_steps(num_pages: int, target_langs: List[str]) -> int:
+    """Number of scheduler steps process_pdf_steps will take"""
+    translation_steps = -(-num_pages // TRANSLATION_PAGES_PER_STEP)
+    return num_pages + translation_steps + len(target_langs)
+
+
+def process_pdf_steps(task_id: str, pdf_path: str, target_langs: List[str]):
+    """
+    Process PDF as a sequence of page-sized steps
+    
+    Each yield is a preemption point for the scheduler: after every OCR
+    page, every translated page chunk and every rendered language.
+    The time budget starts with the first step and is paused at every
+    yield, so time spent queued or preempted is not counted; pages over
+    budget take cheaper paths and are listed in the task's "degraded_pages".
+    """
+    task = tasks[task_id]
+    budget = TimeBudget()
+    
+    # Update status
+    task["status"] = "processing"
+    task["progress"] = 10
+    task["message"] = "Starting OCR..."
+    
+    # OCR, one page per step
+    ocr = get_ocr_service()
+    num_pages = task.get("num_pages") or 1
+    pages_data = []
+    for page in ocr.iter_pages(pdf_path, budget):
+        pages_data.append(page)
+        task["progress"] = 10 + 30 * len(pages_data) // num_pages
+        task["message"] = f"OCR page {len(pages_data)}/{num_pages}..."
+        with budget.paused():
+            yield
+    
+    task["progress"] = 40
+    task["message"] = "OCR completed, starting translation..."
+    
+    # Translation (shared OCR result, batched per language), a few pages per step
+    translator = get_translation_service()
+    translated = {lang: [] for lang in target_langs}
+    for start in range(0, len(pages_data), TRANSLATION_PAGES_PER_STEP):
+        chunk = translator.translate_pages(pages_data[start:start + TRANSLATION_PAGES_PER_STEP], target_langs, budget)
+        for lang in target_langs:
+            translated[lang].extend(chunk[lang])
+        done = min(start + TRANSLATION_PAGES_PER_STEP, len(pages_data))
+        task["progress"] = 40 + 30 * done // len(pages_data)
+        task["message"] = f"Translated page {done}/{len(pages_data)}..."
+        with budget.paused():
+            yield
+    
+    task["progress"] = 70
+    task["message"] = "Translation completed, generating PDF..."
+    
+    # Generate one PDF per language
+    generator = get_pdf_generator()
+    result_paths = {}
+    for idx, lang in enumerate(target_langs):
+        result_path = RESULT_DIR / f"{task_id}_{lang}_translated.pdf"
+        generator.generate_pdf(translated[lang], str(result_path), lang, budget)
+        result_paths[lang] = str(result_path)
+        for page in translated[lang]:
+            if page.degradations:
+                degraded = task.setdefault("degraded_pages", {}).setdefault(str(page.number), [])
+                degraded.extend(d for d in page.degradations if d not in degraded)
+        task["progress"] = 70 + 30 * (idx + 1) // len(target_langs)
+        if idx < len(target_langs) - 1:
+            with budget.paused():
+                yield
+    
+    # Update task
+    task["status"] = "completed"
+    task["progress"] = 100
+    task["message"] = "Processing completed successfully"
+    task["result_paths"] = result_paths
+    task["result_path"] = result_paths[target_langs[0]]
+
+
+def mark_task_failed(task_id: str, e: Exception):
+    """Record a processing error on the task"""
+    print(f"Error processing PDF: {e}")
+    tasks[task_id]["status"] = "failed"
+    tasks[task_id]["message"] = f"Error: {str(e)}"
+    tasks[task_id]["error"] = str(e)
 
 
 if __name__ == "__main__":
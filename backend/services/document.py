@@ -0,0 +1,275 @@
+import struct
+from array import array
+from typing import Iterable, List, Optional, Sequence
+
+
+# Span kinds
+TEXT = 0
+FORMULA = 1
+
+_MAGIC = b"PDTD"
+_VERSION = 1
+_HEADER = struct.Struct("<4sHI")  # magic, version, number of pages
+_PAGE = struct.Struct("<III")  # page number, number of paragraphs, number of layout boxes
+_PARAGRAPH = struct.Struct("<4fIHB")  # bbox, num_elements, number of spans, has original spans
+_SPAN = struct.Struct("<BI")  # kind, utf-8 byte length
+_STR = struct.Struct("<I")
+
+
+class Span:
+    """A run of plain text or a single LaTeX formula inside a paragraph"""
+
+    __slots__ = ("kind", "text")
+
+    def __init__(self, kind: int, text: str):
+        self.kind = kind
+        self.text = text
+
+    @property
+    def is_formula(self) -> bool:
+        return self.kind == FORMULA
+
+    def to_markup(self) -> str:
+        """Render as legacy content markup (formulas wrapped in $$)"""
+        if self.kind == FORMULA:
+            return f"$$\n{self.text}\n$$"
+        return self.text
+
+    def __repr__(self):
+        return f"Span({'formula' if self.kind == FORMULA else 'text'}, {self.text!r})"
+
+
+class Paragraph:
+    """A layout block with its bbox and ordered text/formula spans"""
+
+    __slots__ = ("type", "bbox", "spans", "original_spans", "num_elements")
+
+    def __init__(
+        self,
+        type: str,
+        bbox: Sequence[float],
+        spans: List[Span],
+        num_elements: int = 0,
+        original_spans: Optional[List[Span]] = None,
+    ):
+        self.type = type
+        self.bbox = bbox if isinstance(bbox, array) else array("f", bbox)
+        self.spans = spans
+        self.num_elements = num_elements
+        self.original_spans = original_spans
+
+    @property
+    def content(self) -> str:
+        """Content as text with formulas wrapped in $$...$$"""
+        return "\n\n".join(span.to_markup() for span in self.spans)
+
+    @property
+    def original_content(self) -> str:
+        """Content before translation (same as content if untranslated)"""
+        spans = self.original_spans if self.original_spans is not None else self.spans
+        return "\n\n".join(span.to_markup() for span in spans)
+
+    @property
+    def has_formula(self) -> bool:
+        return any(span.kind == FORMULA for span in self.spans)
+
+    def with_spans(self, spans: List[Span]) -> "Paragraph":
+        """Return a translated copy sharing bbox and keeping the source spans"""
+        return Paragraph(
+            self.type,
+            self.bbox,
+            spans,
+            self.num_elements,
+            self.original_spans if self.original_spans is not None else self.spans,
+        )
+
+    def __repr__(self):
+        return f"Paragraph({self.type!r}, bbox={list(self.bbox)}, spans={len(self.spans)})"
+
+
+class Page:
+    """OCR result of one page: paragraphs plus raw layout boxes"""
+
+    __slots__ = ("number", "paragraphs", "layout_labels", "layout_coords", "degradations")
+
+    def __init__(
+        self,
+        number: int,
+        paragraphs: List[Paragraph],
+        layout_labels: Optional[List[str]] = None,
+        layout_coords: Optional[array] = None,
+        degradations: Optional[List[str]] = None,
+    ):
+        self.number = number
+        self.paragraphs = paragraphs
+        self.layout_labels = layout_labels if layout_labels is not None else []
+        # Flat x1, y1, x2, y2 per layout box
+        self.layout_coords = layout_coords if layout_coords is not None else array("f")
+        # Cheaper processing paths applied to this page (see utils.budget)
+        self.degradations = degradations if degradations is not None else []
+
+    def mark_degraded(self, degradation: str):
+        """Record that a cheaper processing path was used for this page"""
+        if degradation not in self.degradations:
+            self.degradations.append(degradation)
+
+    @classmethod
+    def from_layout(cls, number: int, paragraphs: List[Paragraph], layout_boxes: Iterable[dict]) -> "Page":
+        """Build a page, packing PaddleX layout box dicts into flat arrays"""
+        labels = []
+        coords = array("f")
+        for lb in layout_boxes:
+            labels.append(lb.get("label", ""))
+            coords.extend(map(float, lb["coordinate"]))
+        return cls(number, paragraphs, labels, coords)
+
+    def with_paragraphs(self, paragraphs: List[Paragraph]) -> "Page":
+        """Return a copy with different paragraphs, sharing the layout arrays"""
+        return Page(self.number, paragraphs, self.layout_labels, self.layout_coords, list(self.degradations))
+
+    def layout_box(self, idx: int):
+        """Get (label, (x1, y1, x2, y2)) of a layout box"""
+        return self.layout_labels[idx], tuple(self.layout_coords[idx * 4:idx * 4 + 4])
+
+    def __repr__(self):
+        return f"Page({self.number}, paragraphs={len(self.paragraphs)})"
+
+
+# Binary serialization
+
+def _write_str(out: bytearray, text: str):
+    data = text.encode("utf-8")
+    out += _STR.pack(len(data))
+    out += data
+
+
+def _check_available(buf: memoryview, offset: int, length: int):
+    if offset + length > len(buf):
+        raise ValueError("Truncated document data")
+
+
+def _read_str(buf: memoryview, offset: int):
+    (length,) = _STR.unpack_from(buf, offset)
+    offset += _STR.size
+    _check_available(buf, offset, length)
+    return bytes(buf[offset:offset + length]).decode("utf-8"), offset + length
+
+
+def _write_spans(out: bytearray, spans: List[Span]):
+    for span in spans:
+        data = span.text.encode("utf-8")
+        out += _SPAN.pack(span.kind, len(data))
+        out += data
+
+
+def _read_spans(buf: memoryview, offset: int, count: int):
+    spans = []
+    for _ in range(count):
+        kind, length = _SPAN.unpack_from(buf, offset)
+        offset += _SPAN.size
+        _check_available(buf, offset, length)
+        spans.append(Span(kind, bytes(buf[offset:offset + length]).decode("utf-8")))
+        offset += length
+    return spans, offset
+
+
+def pages_to_bytes(pages: List[Page]) -> bytes:
+    """
+    Serialize pages to a compact binary format for checkpointing/caching
+
+    Args:
+        pages: List of pages
+
+    Returns:
+        Serialized bytes
+    """
+    out = bytearray(_HEADER.pack(_MAGIC, _VERSION, len(pages)))
+    for page in pages:
+        out += _PAGE.pack(page.number, len(page.paragraphs), len(page.layout_labels))
+        for label in page.layout_labels:
+            _write_str(out, label)
+        out += struct.pack(f"<{len(page.layout_coords)}f", *page.layout_coords)
+        out += _STR.pack(len(page.degradations))
+        for degradation in page.degradations:
+            _write_str(out, degradation)
+
+        for para in page.paragraphs:
+            has_original = para.original_spans is not None
+            out += _PARAGRAPH.pack(*para.bbox, para.num_elements, len(para.spans), has_original)
+            _write_str(out, para.type)
+            _write_spans(out, para.spans)
+            if has_original:
+                out += _STR.pack(len(para.original_spans))
+                _write_spans(out, para.original_spans)
+    return bytes(out)
+
+
+def pages_from_bytes(data: bytes) -> List[Page]:
+    """
+    Deserialize pages produced by pages_to_bytes
+
+    Args:
+        data: Serialized bytes
+
+    Returns:
+        List of pages
+
+    Raises:
+        ValueError: If the data is truncated, corrupt or not a supported
+            serialized document
+    """
+    try:
+        return _read_pages(memoryview(data))
+    except (struct.error, UnicodeDecodeError) as e:
+        raise ValueError(f"Corrupt document data: {e}") from e
+
+
+def _read_pages(buf: memoryview) -> List[Page]:
+    """Parse serialized pages (see pages_from_bytes)"""
+    if len(buf) < _HEADER.size:
+        raise ValueError("Truncated document data")
+    magic, version, num_pages = _HEADER.unpack_from(buf, 0)
+    if magic != _MAGIC or version != _VERSION:
+        raise ValueError("Unsupported document data")
+    offset = _HEADER.size
+
+    pages = []
+    for _ in range(num_pages):
+        number, num_paragraphs, num_boxes = _PAGE.unpack_from(buf, offset)
+        offset += _PAGE.size
+
+        labels = []
+        for _ in range(num_boxes):
+            label, offset = _read_str(buf, offset)
+            labels.append(label)
+        coords_format = struct.Struct(f"<{num_boxes * 4}f")
+        coords = array("f", coords_format.unpack_from(buf, offset))
+        offset += coords_format.size
+
+        (num_degradations,) = _STR.unpack_from(buf, offset)
+        offset += _STR.size
+        degradations = []
+        for _ in range(num_degradations):
+            degradation, offset = _read_str(buf, offset)
+            degradations.append(degradation)
+
+        paragraphs = []
+        for _ in range(num_paragraphs):
+            x1, y1, x2, y2, num_elements, num_spans, has_original = _PARAGRAPH.unpack_from(buf, offset)
+            offset += _PARAGRAPH.size
+            para_type, offset = _read_str(buf, offset)
+            spans, offset = _read_spans(buf, offset, num_spans)
+            original_spans = None
+            if has_original:
+                (num_original,) = _STR.unpack_from(buf, offset)
+                offset += _STR.size
+                original_spans, offset = _read_spans(buf, offset, num_original)
+            paragraphs.append(Paragraph(
+                para_type, array("f", (x1, y1, x2, y2)), spans, num_elements, original_spans
+            ))
+
+        pages.append(Page(number, paragraphs, labels, coords, degradations))
+
+    if offset != len(buf):
+        raise ValueError("Trailing data after document")
+    return pages
@@ -4,10 +4,22 @@ import fitz
 import numpy as np
 from PIL import Image, ImageDraw
 from paddleocr import PaddleOCR, FormulaRecognitionPipeline
-from typing import List, Dict, Any
+from typing import Iterator, List, Dict, Any, Optional
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
-from config import DPI, DEVICE_TEXT, DEVICE_FORMULA
+from config import (
+    DPI, DEGRADED_DPI, DEVICE_TEXT, DEVICE_FORMULA,
+    OCR_TEXT_REC_BATCH_SIZE, OCR_TEXT_REC_MAX_BATCH_SIZE, OCR_TEXT_REC_BATCH_PER_GB
+)
+from services.document import Page, Paragraph, Span, TEXT, FORMULA
+from utils.budget import TimeBudget, LOW_RES_OCR
+from utils.batching import initial_batch_size, is_out_of_memory, release_cached_memory
+
+
+def count_pdf_pages(pdf_path: str) -> int:
+    """Read the page count of a PDF without rendering it"""
+    with fitz.open(pdf_path) as doc:
+        return doc.page_count
 
 
 class OCRService:
@@ -15,6 +27,12 @@ class OCRService:
     
     def __init__(self):
         """Initialize OCR models"""
+        # Text recognition batch size is fixed at construction, so size it
+        # from the free device memory (or CPU threads) up front
+        rec_batch_size = initial_batch_size(
+            DEVICE_TEXT, OCR_TEXT_REC_BATCH_SIZE, OCR_TEXT_REC_MAX_BATCH_SIZE, OCR_TEXT_REC_BATCH_PER_GB
+        )
+        print(f"OCR text recognition batch size: {rec_batch_size}")
         self.text_ocr = PaddleOCR(
             text_detection_model_name="PP-OCRv5_mobile_det",
             text_recognition_model_name="PP-OCRv5_mobile_rec",
@@ -22,7 +40,7 @@ class OCRService:
             use_doc_unwarping=False,
             use_textline_orientation=False,
             device=DEVICE_TEXT,
-            text_recognition_batch_size=4
+            text_recognition_batch_size=rec_batch_size
         )
         
         self.formula_pipeline = FormulaRecognitionPipeline(
@@ -30,39 +48,76 @@ class OCRService:
             device=DEVICE_FORMULA,
         )
     
-    def process_pdf(self, pdf_path: str) -> List[Dict[str, Any]]:
+    def process_pdf(self, pdf_path: str, budget: Optional[TimeBudget] = None) -> List[Page]:
         """
         Process PDF and extract structured content
         
         Args:
             pdf_path: Path to PDF file
+            budget: Optional time budget; pages are OCR'd at DEGRADED_DPI
+                while it is exceeded
             
         Returns:
-            List of page data with paragraphs containing text and formulas
+            List of pages with paragraphs containing text and formulas
         """
-        # Convert PDF to images
-        pages_data = []
-        doc = fitz.open(pdf_path)
-        
-        scale = DPI / 72.0
-        mat = fitz.Matrix(scale, scale)
+        return list(self.iter_pages(pdf_path, budget))
+    
+    def iter_pages(self, pdf_path: str, budget: Optional[TimeBudget] = None) -> Iterator[Page]:
+        """
+        Process PDF lazily, one page per iteration
         
-        for page_idx in range(len(doc)):
-            print(f"Processing page {page_idx + 1}/{len(doc)}")
-            
-            # Convert page to image
-            pix = doc[page_idx].get_pixmap(matrix=mat)
-            page_img = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
-            np_page = np.array(page_img)
+        Args:
+            pdf_path: Path to PDF file
+            budget: Optional time budget; pages are OCR'd at DEGRADED_DPI
+                while it is exceeded
             
-            # Process page
-            page_content = self._process_page(page_img, np_page, page_idx + 1)
-            pages_data.append(page_content)
+        Yields:
+            Pages with paragraphs containing text and formulas
+        """
+        doc = fitz.open(pdf_path)
         
-        doc.close()
-        return pages_data
+        try:
+            for page_idx in range(len(doc)):
+                print(f"Processing page {page_idx + 1}/{len(doc)}")
+                
+                # A page can't be made cheaper once OCR has started, so decide
+                # up front from the job budget and the previous page
+                degraded = budget is not None and (budget.job_expired() or budget.last_page_over_budget)
+                if budget is not None:
+                    budget.start_page()
+                
+                page = None
+                try:
+                    page = self._ocr_page(doc[page_idx], page_idx + 1, DEGRADED_DPI if degraded else DPI)
+                except Exception as e:
+                    # Out of memory on a huge page: retry once at lower resolution
+                    if degraded or not is_out_of_memory(e):
+                        raise
+                
+                if page is None:
+                    # Retried outside the except block so the failed attempt's
+                    # buffers, referenced by the traceback, are freed first
+                    print(f"Out of memory on page {page_idx + 1}, retrying at {DEGRADED_DPI} DPI")
+                    release_cached_memory()
+                    degraded = True
+                    page = self._ocr_page(doc[page_idx], page_idx + 1, DEGRADED_DPI)
+                if degraded:
+                    page.mark_degraded(LOW_RES_OCR)
+                if budget is not None:
+                    budget.end_page()
+                yield page
+        finally:
+            doc.close()
+    
+    def _ocr_page(self, pdf_page, page_num: int, dpi: int) -> Page:
+        """Render a PDF page at the given DPI and process it"""
+        scale = dpi / 72.0
+        pix = pdf_page.get_pixmap(matrix=fitz.Matrix(scale, scale))
+        page_img = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+        np_page = np.array(page_img)
+        return self._process_page(page_img, np_page, page_num)
     
-    def _process_page(self, page_img: Image.Image, np_page: np.ndarray, page_num: int) -> Dict[str, Any]:
+    def _process_page(self, page_img: Image.Image, np_page: np.ndarray, page_num: int) -> Page:
         """Process a single page"""
         # Layout detection and formula recognition
         out = self.formula_pipeline.predict(np_page)
@@ -107,13 +162,9 @@ class OCRService:
         # Group into paragraphs by layout
         paragraphs = self._group_into_paragraphs(layout_boxes, text_items, formula_items)
         
-        return {
-            "page": page_num,
-            "paragraphs": paragraphs,
-            "layout_boxes": layout_boxes
-        }
+        return Page.from_layout(page_num, paragraphs, layout_boxes)
     
-    def _group_into_paragraphs(self, layout_boxes: List, text_items: List, formula_items: List) -> List[Dict]:
+    def _group_into_paragraphs(self, layout_boxes: List, text_items: List, formula_items: List) -> List[Paragraph]:
         """Group text and formulas into paragraphs based on layout"""
         paragraphs = []
         
@@ -143,20 +194,18 @@ class OCRService:
             # Sort by vertical position
             elems.sort(key=lambda x: x["y"])
             
-            # Build content
-            content = []
+            # Build spans, merging consecutive text lines into one span
+            spans = []
             for e in elems:
                 if e["type"] == "text":
-                    content.append(e["v"])
+                    if spans and spans[-1].kind == TEXT:
+                        spans[-1].text += "\n\n" + e["v"]
+                    else:
+                        spans.append(Span(TEXT, e["v"]))
                 else:
-                    content.append(f"$$\n{e['v']}\n$$")
+                    spans.append(Span(FORMULA, e["v"]))
             
-            paragraphs.append({
-                "type": label,
-                "bbox": [lx1, ly1, lx2, ly2],
-                "content": "\n\n".join(content),
-                "num_elements": len(elems)
-            })
+            paragraphs.append(Paragraph(label, (lx1, ly1, lx2, ly2), spans, len(elems)))
         
         return paragraphs
     
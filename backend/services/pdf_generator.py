@@ -1,7 +1,6 @@
 import os
-import re
 from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.styles import StyleSheet1, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak, Image
 from reportlab.pdfbase import pdfmetrics
@@ -10,50 +9,181 @@ from reportlab.lib.enums import TA_LEFT, TA_CENTER
 from io import BytesIO
 import subprocess
 import tempfile
-from typing import List, Dict
+import threading
+from typing import List, Dict, Optional
 from PIL import Image as PILImage
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from config import DEFAULT_TARGET_LANG, FORMULA_RENDER_TIMEOUT_SECONDS
+from services.document import Page, Span
+from utils.budget import TimeBudget, FORMULA_AS_TEXT
+
+# Page label per target language
+PAGE_LABELS = {
+    "kor_Hang": "페이지",
+    "jpn_Jpan": "ページ",
+    "zho_Hans": "页",
+    "zho_Hant": "頁",
+}
+
+
+# Candidate fonts per target language as (path, subfont index); the first one
+# that loads is used. reportlab only embeds TrueType outlines, so CFF-based
+# fonts (Hiragino, Noto Sans CJK .ttc) are skipped when they fail to load.
+FONT_CANDIDATES = {
+    "kor_Hang": [
+        ("C:/Windows/Fonts/malgun.ttf", 0),  # Windows: Malgun Gothic
+        ("/System/Library/Fonts/AppleSDGothicNeo.ttc", 0),  # macOS
+        ("/usr/share/fonts/truetype/nanum/NanumGothic.ttf", 0),  # Linux: fonts-nanum
+        ("/usr/share/fonts/truetype/unfonts-core/UnDotum.ttf", 0),  # Linux: fonts-unfonts-core
+    ],
+    "jpn_Jpan": [
+        ("C:/Windows/Fonts/YuGothM.ttc", 0),  # Windows: Yu Gothic Medium
+        ("C:/Windows/Fonts/msgothic.ttc", 0),  # Windows: MS Gothic
+        ("/System/Library/Fonts/ヒラギノ角ゴシック W3.ttc", 0),  # macOS: Hiragino Sans
+        ("/Library/Fonts/Arial Unicode.ttf", 0),  # macOS
+        ("/usr/share/fonts/opentype/ipafont-gothic/ipag.ttf", 0),  # Linux: fonts-ipafont-gothic
+        ("/usr/share/fonts/truetype/takao-gothic/TakaoGothic.ttf", 0),  # Linux: fonts-takao-gothic
+    ],
+    "zho_Hans": [
+        ("C:/Windows/Fonts/msyh.ttc", 0),  # Windows: Microsoft YaHei
+        ("/Library/Fonts/Arial Unicode.ttf", 0),  # macOS
+        ("/usr/share/fonts/truetype/wqy/wqy-zenhei.ttc", 0),  # Linux: fonts-wqy-zenhei
+        ("/usr/share/fonts/truetype/wqy/wqy-microhei.ttc", 0),  # Linux: fonts-wqy-microhei
+    ],
+    "zho_Hant": [
+        ("C:/Windows/Fonts/msjh.ttc", 0),  # Windows: Microsoft JhengHei
+        ("/Library/Fonts/Arial Unicode.ttf", 0),  # macOS
+        ("/usr/share/fonts/truetype/wqy/wqy-zenhei.ttc", 0),  # Linux: fonts-wqy-zenhei
+        ("/usr/share/fonts/truetype/wqy/wqy-microhei.ttc", 0),  # Linux: fonts-wqy-microhei
+    ],
+}
+
+# Fonts and styles are process-wide and shared by all generators/jobs
+_resource_lock = threading.Lock()
+_font_names: Dict[str, str] = {}
+_styles_cache: Dict[str, StyleSheet1] = {}
+
+
+def _locked(method, lock: threading.Lock):
+    """Serialize calls to a font face method; the face's file reader is not thread-safe"""
+    def wrapper(*args, **kwargs):
+        with lock:
+            return method(*args, **kwargs)
+    return wrapper
+
+
+def _register_font(target_lang: str) -> str:
+    """Register the CJK font for a target language once per process and return its name"""
+    with _resource_lock:
+        font_name = _font_names.get(target_lang)
+        if font_name is not None:
+            return font_name
+        
+        font_name = 'Helvetica'
+        for font_path, subfont_index in FONT_CANDIDATES.get(target_lang, []):
+            if not os.path.exists(font_path):
+                continue
+            try:
+                font = TTFont(f'CJK-{target_lang}', font_path, subfontIndex=subfont_index)
+                font.face.makeSubset = _locked(font.face.makeSubset, threading.Lock())
+                pdfmetrics.registerFont(font)
+            except Exception as e:
+                # e.g. CFF outlines, which reportlab can't embed; try the next font
+                print(f"Error registering font {font_path}: {e}")
+                continue
+            font_name = font.fontName
+            print(f"Registered {target_lang} font: {font_path} (subfont {subfont_index})")
+            break
+        else:
+            # Fallback to Helvetica
+            print(f"Warning: {target_lang} font not found, using Helvetica")
+        
+        _font_names[target_lang] = font_name
+        return font_name
+
+
+def _get_styles(font_name: str) -> StyleSheet1:
+    """Get the shared stylesheet for a font, building it on first use"""
+    with _resource_lock:
+        styles = _styles_cache.get(font_name)
+        if styles is None:
+            styles = _create_styles(font_name)
+            _styles_cache[font_name] = styles
+        return styles
+
+
+def _create_styles(font_name: str) -> StyleSheet1:
+    """Create custom styles for PDF"""
+    styles = StyleSheet1()
+    
+    # Normal paragraph style
+    styles.add(ParagraphStyle(
+        name='Normal',
+        fontName=font_name,
+        fontSize=11,
+        leading=16,
+        alignment=TA_LEFT,
+        spaceAfter=10
+    ))
+    
+    # Page number style
+    styles.add(ParagraphStyle(
+        name='PageNumber',
+        fontName=font_name,
+        fontSize=9,
+        textColor='gray',
+        alignment=TA_CENTER
+    ))
+    
+    # Formula style
+    styles.add(ParagraphStyle(
+        name='Formula',
+        fontName='Courier',
+        fontSize=10,
+        leading=14,
+        leftIndent=20,
+        rightIndent=20,
+        spaceAfter=10,
+        textColor='darkblue'
+    ))
+    
+    return styles
 
 
 class PDFGenerator:
-    """Generate PDF from translated content"""
+    """
+    Generate PDF from translated content
+    
+    Fonts and styles are shared across instances, and generate_pdf keeps
+    no per-call state on the instance, so one generator can be used from
+    several worker threads concurrently.
+    """
     
     def __init__(self):
-        """Initialize PDF generator with Korean font support"""
-        # Register Korean font (using system fonts)
-        # Note: You may need to adjust font path based on your system
-        try:
-            # Try to register a Korean font
-            # Windows: Malgun Gothic
-            # Linux: Noto Sans CJK KR
-            font_paths = [
-                "C:/Windows/Fonts/malgun.ttf",  # Windows
-                "/usr/share/fonts/truetype/noto/NotoSansCJK-Regular.ttc",  # Linux
-                "/System/Library/Fonts/AppleSDGothicNeo.ttc"  # macOS
-            ]
-            
-            for font_path in font_paths:
-                if os.path.exists(font_path):
-                    pdfmetrics.registerFont(TTFont('Korean', font_path))
-                    self.korean_font = 'Korean'
-                    print(f"Registered Korean font: {font_path}")
-                    break
-            else:
-                # Fallback to Helvetica
-                self.korean_font = 'Helvetica'
-                print("Warning: Korean font not found, using Helvetica")
-        except Exception as e:
-            print(f"Error registering font: {e}")
-            self.korean_font = 'Helvetica'
+        """Initialize PDF generator, preloading the default language's font and styles"""
+        self._styles_for(DEFAULT_TARGET_LANG)
+    
+    def _styles_for(self, target_lang: str) -> StyleSheet1:
+        """Shared stylesheet using the font that covers the target language"""
+        return _get_styles(_register_font(target_lang))
     
-    def generate_pdf(self, pages_data: List[Dict], output_path: str) -> str:
+    def generate_pdf(
+        self,
+        pages_data: List[Page],
+        output_path: str,
+        target_lang: str = DEFAULT_TARGET_LANG,
+        budget: Optional[TimeBudget] = None
+    ) -> str:
         """
         Generate PDF from translated pages data
         
         Args:
-            pages_data: List of page dictionaries with translated paragraphs
+            pages_data: List of pages with translated paragraphs
             output_path: Path to save the PDF
+            target_lang: NLLB code of the translated language (for labels)
+            budget: Optional time budget; once exceeded, formulas are
+                emitted as LaTeX text instead of rendered images
             
         Returns:
             Path to generated PDF
@@ -70,41 +200,47 @@ class PDFGenerator:
         # Container for the 'Flowable' objects
         elements = []
         
-        # Define styles
-        styles = self._create_styles()
+        styles = self._styles_for(target_lang)
+        page_label = PAGE_LABELS.get(target_lang, "Page")
         
         # Process each page
         for page_idx, page_data in enumerate(pages_data):
             print(f"Generating PDF page {page_idx + 1}/{len(pages_data)}")
+            if budget is not None:
+                budget.start_page()
             
             # Add page number
             page_num = Paragraph(
-                f"<font name='{self.korean_font}'>페이지 {page_data['page']}</font>",
+                f"{page_label} {page_data.number}",
                 styles['PageNumber']
             )
             elements.append(page_num)
             elements.append(Spacer(1, 0.2 * inch))
             
             # Add paragraphs
-            for para in page_data.get('paragraphs', []):
-                content = para.get('content', '')
-                
-                if not content.strip():
+            for para in page_data.paragraphs:
+                if not para.spans:
                     continue
                 
                 # Check if paragraph contains formulas
-                if '$$' in content:
+                if para.has_formula:
                     # Process mixed content (text + formulas)
-                    self._add_mixed_content(elements, content, styles)
+                    self._add_mixed_content(elements, para.spans, styles, page_data, budget)
                 else:
                     # Plain text paragraph
+                    content = "\n\n".join(span.text for span in para.spans)
+                    if not content.strip():
+                        continue
                     p = Paragraph(
-                        f"<font name='{self.korean_font}'>{self._escape_html(content)}</font>",
+                        self._escape_html(content),
                         styles['Normal']
                     )
                     elements.append(p)
                     elements.append(Spacer(1, 0.15 * inch))
             
+            if budget is not None:
+                budget.end_page()
+            
             # Add page break except for last page
             if page_idx < len(pages_data) - 1:
                 elements.append(PageBreak())
@@ -115,77 +251,51 @@ class PDFGenerator:
         
         return output_path
     
-    def _create_styles(self):
-        """Create custom styles for PDF"""
-        styles = getSampleStyleSheet()
-        
-        # Normal paragraph style
-        styles.add(ParagraphStyle(
-            name='Normal',
-            fontName=self.korean_font,
-            fontSize=11,
-            leading=16,
-            alignment=TA_LEFT,
-            spaceAfter=10
-        ))
-        
-        # Page number style
-        styles.add(ParagraphStyle(
-            name='PageNumber',
-            fontName=self.korean_font,
-            fontSize=9,
-            textColor='gray',
-            alignment=TA_CENTER
-        ))
-        
-        # Formula style
-        styles.add(ParagraphStyle(
-            name='Formula',
-            fontName='Courier',
-            fontSize=10,
-            leading=14,
-            leftIndent=20,
-            rightIndent=20,
-            spaceAfter=10,
-            textColor='darkblue'
-        ))
-        
-        return styles
-    
-    def _add_mixed_content(self, elements, content: str, styles):
+    def _add_mixed_content(
+        self,
+        elements,
+        spans: List[Span],
+        styles,
+        page: Optional[Page] = None,
+        budget: Optional[TimeBudget] = None
+    ):
         """Add content with mixed text and formulas"""
-        # Split by formula blocks
-        parts = re.split(r'(\$\$.*?\$\$)', content, flags=re.DOTALL)
-        
-        for part in parts:
-            if part.startswith('$$') and part.endswith('$$'):
+        for span in spans:
+            if span.is_formula:
                 # Formula block
-                formula = part[2:-2].strip()
+                formula = span.text.strip()
+                
+                # Try to render formula as image using LaTeX, unless over budget
+                formula_img = None
+                if budget is None:
+                    formula_img = self._render_formula(formula)
+                elif not budget.should_degrade():
+                    formula_img = self._render_formula(formula, budget.timeout(FORMULA_RENDER_TIMEOUT_SECONDS))
                 
-                # Try to render formula as image using LaTeX
-                formula_img = self._render_formula(formula)
+                if formula_img is None and budget is not None and budget.should_degrade() and page is not None:
+                    page.mark_degraded(FORMULA_AS_TEXT)
                 
                 if formula_img:
                     elements.append(formula_img)
                 else:
                     # Fallback: show LaTeX code
                     p = Paragraph(
-                        f"<font name='Courier'>[Formula: {self._escape_html(formula)}]</font>",
+                        f"[Formula: {self._escape_html(formula)}]",
                         styles['Formula']
                     )
                     elements.append(p)
                 
                 elements.append(Spacer(1, 0.1 * inch))
-            elif part.strip():
+            elif span.text.strip():
                 # Text block
                 p = Paragraph(
-                    f"<font name='{self.korean_font}'>{self._escape_html(part)}</font>",
+                    self._escape_html(span.text),
                     styles['Normal']
                 )
                 elements.append(p)
                 elements.append(Spacer(1, 0.1 * inch))
     
-    def _render_formula(self, formula: str):
+    def _render_formula(self, formula: str, timeout: float = FORMULA_RENDER_TIMEOUT_SECONDS):
         """Render LaTeX formula as image (requires LaTeX installation)"""
         try:
             # Create temporary LaTeX file
@@ -206,7 +316,7 @@ ${formula}$
             result = subprocess.run(
                 ['pdflatex', '-output-directory', output_dir, tex_file],
                 capture_output=True,
-                timeout=10
+                timeout=timeout
             )
             
             if result.returncode == 0:
@@ -217,7 +327,7 @@ ${formula}$
                 subprocess.run(
                     ['convert', '-density', '300', pdf_file, png_file],
                     capture_output=True,
-                    timeout=10
+                    timeout=timeout
                 )
                 
                 if os.path.exists(png_file):
@@ -0,0 +1,238 @@
+import os
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from config import (
+    SCHEDULER_WORKERS, MAX_QUEUED_JOBS_PER_CLIENT, FAIR_SHARE_HALF_LIFE_SECONDS,
+    PRIORITY_AGING_SECONDS, DEFAULT_SECONDS_PER_STEP
+)
+
+_DONE = object()
+
+
+class QueueFullError(Exception):
+    """Raised when a client already has too many jobs queued"""
+
+
+class Job:
+    """A schedulable job made of page-sized steps"""
+
+    __slots__ = (
+        "job_id", "client_id", "priority", "num_pages", "total_steps",
+        "steps_done", "steps", "submitted_at", "last_run", "on_error", "running"
+    )
+
+    def __init__(
+        self,
+        job_id: str,
+        client_id: str,
+        steps: Iterator,
+        num_pages: int,
+        total_steps: int,
+        priority: int = 0,
+        on_error: Optional[Callable[[Exception], None]] = None,
+    ):
+        """
+        Args:
+            job_id: Unique job ID (task ID)
+            client_id: Owner used for fair-share accounting
+            steps: Iterator whose every next() performs one unit of work
+                (e.g. one page); jobs can be preempted between steps
+            num_pages: Page count, used as the shortest-job-first hint
+            total_steps: Expected number of steps, used for ETA
+            priority: Higher runs first
+            on_error: Called with the exception if a step fails
+        """
+        self.job_id = job_id
+        self.client_id = client_id
+        self.steps = steps
+        self.num_pages = num_pages
+        self.total_steps = max(total_steps, 1)
+        self.priority = priority
+        self.on_error = on_error
+        self.steps_done = 0
+        self.submitted_at = time.monotonic()
+        self.last_run = self.submitted_at
+        self.running = False
+
+    @property
+    def remaining_steps(self) -> int:
+        return max(self.total_steps - self.steps_done, 1)
+
+
+class JobScheduler:
+    """
+    Priority / fair-share / shortest-job-first scheduler
+
+    Jobs run one step at a time in worker threads. After every step the
+    next job is picked again, so large documents are preempted at page
+    boundaries and short jobs from other clients get through quickly.
+
+    Ordering key (smallest first):
+        1. priority, raised by one level per PRIORITY_AGING_SECONDS a job
+           waits without running, so nothing starves
+        2. client's recent usage (exponentially decayed steps consumed)
+        3. remaining steps (shortest job first)
+        4. submission time
+    """
+
+    def __init__(
+        self,
+        workers: int = SCHEDULER_WORKERS,
+        max_jobs_per_client: int = MAX_QUEUED_JOBS_PER_CLIENT,
+        half_life_seconds: float = FAIR_SHARE_HALF_LIFE_SECONDS,
+        aging_seconds: float = PRIORITY_AGING_SECONDS,
+    ):
+        self.workers = workers
+        self.max_jobs_per_client = max_jobs_per_client
+        self.half_life_seconds = half_life_seconds
+        self.aging_seconds = aging_seconds
+        self.jobs: Dict[str, Job] = {}
+        self.seconds_per_step = DEFAULT_SECONDS_PER_STEP
+        self._usage: Dict[str, float] = {}
+        self._usage_updated: Dict[str, float] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker_tasks: List[asyncio.Task] = []
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def start(self):
+        """Start worker loops on the running event loop"""
+        if self._worker_tasks:
+            return
+        self._wakeup = asyncio.Event()
+        # Steps run on threads of their own, not the loop's default executor
+        # shared with file I/O, so model calls stay on a fixed set of threads
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job-step")
+        for _ in range(self.workers):
+            self._worker_tasks.append(asyncio.create_task(self._worker()))
+
+    async def stop(self):
+        """Stop worker loops (running steps finish in their threads)"""
+        for task in self._worker_tasks:
+            task.cancel()
+        for task in self._worker_tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._worker_tasks = []
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def submit(self, job: Job):
+        """
+        Queue a job
+
+        Raises:
+            QueueFullError: If the client is over its queued job quota
+        """
+        client_jobs = sum(1 for j in self.jobs.values() if j.client_id == job.client_id)
+        if client_jobs >= self.max_jobs_per_client:
+            raise QueueFullError(
+                f"Too many jobs in progress for this client (max {self.max_jobs_per_client})"
+            )
+        self.jobs[job.job_id] = job
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def queue_info(self, job_id: str) -> Optional[dict]:
+        """
+        Get queue position and estimated time to completion of a job
+
+        Returns:
+            {"queue_position": int, "eta_seconds": float} or None if the
+            job is not scheduled (finished or unknown). Position 0 means
+            the job is currently running.
+        """
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+
+        order = self._ordered_jobs()
+        waiting = [j for j in order if not j.running]
+        if job.running:
+            position = 0
+            steps_ahead = 0
+        else:
+            idx = waiting.index(job)
+            position = idx + 1
+            steps_ahead = sum(j.remaining_steps for j in waiting[:idx])
+
+        # Running jobs share workers with the queue; approximate by spreading
+        # all outstanding work ahead of this job across the workers
+        steps_ahead += sum(j.remaining_steps for j in order if j.running and j is not job)
+        eta_steps = steps_ahead / max(self.workers, 1) + job.remaining_steps
+        return {
+            "queue_position": position,
+            "eta_seconds": round(eta_steps * self.seconds_per_step, 1),
+        }
+
+    def _client_usage(self, client_id: str, now: float) -> float:
+        usage = self._usage.get(client_id, 0.0)
+        if usage:
+            elapsed = now - self._usage_updated.get(client_id, now)
+            usage *= 0.5 ** (elapsed / self.half_life_seconds)
+        return usage
+
+    def _charge(self, client_id: str, cost: float):
+        now = time.monotonic()
+        self._usage[client_id] = self._client_usage(client_id, now) + cost
+        self._usage_updated[client_id] = now
+
+    def _ordered_jobs(self) -> List[Job]:
+        now = time.monotonic()
+
+        def key(job: Job):
+            aged_priority = job.priority + int((now - job.last_run) / self.aging_seconds)
+            return (
+                -aged_priority,
+                self._client_usage(job.client_id, now),
+                job.remaining_steps,
+                job.submitted_at,
+            )
+
+        return sorted(self.jobs.values(), key=key)
+
+    def _next_job(self) -> Optional[Job]:
+        for job in self._ordered_jobs():
+            if not job.running:
+                return job
+        return None
+
+    async def _worker(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            job.running = True
+            started = time.monotonic()
+            try:
+                loop = asyncio.get_running_loop()
+                result = await loop.run_in_executor(self._executor, next, job.steps, _DONE)
+            except Exception as e:
+                print(f"Job {job.job_id} failed: {e}")
+                self.jobs.pop(job.job_id, None)
+                if job.on_error is not None:
+                    job.on_error(e)
+                continue
+            finally:
+                job.running = False
+                job.last_run = time.monotonic()
+                # Let idle workers pick up the job if this one moves on
+                self._wakeup.set()
+
+            if result is _DONE:
+                self.jobs.pop(job.job_id, None)
+                continue
+
+            elapsed = time.monotonic() - started
+            job.steps_done += 1
+            self.seconds_per_step = 0.9 * self.seconds_per_step + 0.1 * elapsed
+            self._charge(job.client_id, 1.0)
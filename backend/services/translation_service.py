@@ -1,15 +1,21 @@
 import re
 import torch
 from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
-from typing import List, Union
+from typing import Dict, List, Optional, Set
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
-from config import TRANSLATION_MODEL, TRANSLATION_DEVICE, TRANSLATION_BATCH_SIZE
+from config import (
+    TRANSLATION_MODEL, TRANSLATION_DEVICE, TRANSLATION_BATCH_SIZE, TRANSLATION_MAX_BATCH_SIZE,
+    TRANSLATION_NUM_BEAMS, DEFAULT_TARGET_LANG
+)
+from services.document import Page, Span, TEXT
+from utils.budget import TimeBudget, GREEDY_DECODING
+from utils.batching import AdaptiveBatchController
 
 
 class TranslationService:
-    """Translation service using NLLB for English to Korean translation"""
+    """Translation service using NLLB for English to Korean (or other target language) translation"""
     
     def __init__(self):
         """Initialize NLLB model"""
@@ -25,58 +31,16 @@ class TranslationService:
             print("Translation model loaded on CPU")
         
         self.model.eval()
-    
-    def translate_content(self, content: str) -> str:
-        """
-        Translate content while preserving LaTeX formulas
-        
-        Args:
-            content: Text content with potential LaTeX formulas ($$...$$)
-            
-        Returns:
-            Translated content with formulas preserved
-        """
-        # Split content by formula blocks
-        parts = re.split(r'(\$\$.*?\$\$)', content, flags=re.DOTALL)
-        
-        translated_parts = []
-        for part in parts:
-            # Check if this is a formula block
-            if part.startswith('$$') and part.endswith('$$'):
-                # Preserve formula as-is
-                translated_parts.append(part)
-            elif part.strip():
-                # Translate text
-                translated = self._translate_text(part)
-                translated_parts.append(translated)
-            else:
-                # Preserve whitespace
-                translated_parts.append(part)
-        
-        return ''.join(translated_parts)
-    
-    def _translate_text(self, text: str) -> str:
-        """Translate plain text (no formulas)"""
-        if not text.strip():
-            return text
-        
-        # Split into sentences for better translation
-        sentences = self._split_sentences(text)
         
-        if not sentences:
-            return text
+        # Beam width comes from the model's generation config unless overridden
+        self.num_beams = TRANSLATION_NUM_BEAMS or getattr(self.model.generation_config, "num_beams", None) or 1
         
-        # Translate in batches
-        translated_sentences = []
-        for i in range(0, len(sentences), TRANSLATION_BATCH_SIZE):
-            batch = sentences[i:i + TRANSLATION_BATCH_SIZE]
-            translated_batch = self._translate_batch(batch)
-            translated_sentences.extend(translated_batch)
-        
-        return ' '.join(translated_sentences)
+        # Batch sizes adapt per sentence-length bucket to the available memory
+        device = TRANSLATION_DEVICE if torch.cuda.is_available() else "cpu"
+        self.batcher = AdaptiveBatchController(device, TRANSLATION_BATCH_SIZE, TRANSLATION_MAX_BATCH_SIZE)
     
-    def _translate_batch(self, texts: List[str]) -> List[str]:
-        """Translate a batch of texts"""
+    def _translate_batch(self, texts: List[str], target_lang: str = DEFAULT_TARGET_LANG, greedy: bool = False) -> List[str]:
+        """Translate a batch of texts (greedy=True skips beam search)"""
         if not texts:
             return []
         
@@ -87,11 +51,12 @@ class TranslationService:
         if torch.cuda.is_available() and TRANSLATION_DEVICE == "cuda":
             inputs = {k: v.to(TRANSLATION_DEVICE) for k, v in inputs.items()}
         
-        # Generate translation with target language code for Korean
+        # Generate translation with target language code
         with torch.no_grad():
             translated = self.model.generate(
                 **inputs,
-                forced_bos_token_id=self.tokenizer.lang_code_to_id.get("kor_Hang", self.tokenizer.lang_code_to_id["kor_Hang"]),
+                forced_bos_token_id=self.tokenizer.lang_code_to_id[target_lang],
+                num_beams=1 if greedy else self.num_beams,
                 max_length=512
             )
         
@@ -106,28 +71,93 @@ class TranslationService:
         sentences = re.split(r'(?<=[.!?])\s+', text)
         return [s.strip() for s in sentences if s.strip()]
     
-    def translate_paragraphs(self, paragraphs: List[dict]) -> List[dict]:
+    def translate_pages(
+        self,
+        pages: List[Page],
+        target_langs: List[str],
+        budget: Optional[TimeBudget] = None
+    ) -> Dict[str, List[Page]]:
         """
-        Translate paragraphs from OCR output
+        Translate OCR pages into several target languages
+        
+        Sentences are collected once across the whole document and
+        deduplicated, then translated in batches per language, so the
+        OCR result is shared and each extra language only costs generation.
         
         Args:
-            paragraphs: List of paragraph dictionaries with 'content' field
+            pages: OCR output pages
+            target_langs: NLLB target language codes
+            budget: Optional time budget; once exceeded, remaining batches
+                use greedy decoding and the pages containing those
+                sentences are marked degraded
             
         Returns:
-            List of paragraphs with translated content
+            Mapping of target language code to translated pages
         """
-        translated_paragraphs = []
-        
-        for para in paragraphs:
-            translated_para = para.copy()
-            original_content = para.get("content", "")
+        # Segment every text span once into indices of the shared sentence table
+        sentence_index: Dict[str, int] = {}
+        segmented_pages = []
+        for page in pages:
+            segmented_paragraphs = []
+            for para in page.paragraphs:
+                segments = []
+                for span in para.spans:
+                    if span.is_formula:
+                        segments.append(None)
+                    else:
+                        segments.append([
+                            sentence_index.setdefault(sentence, len(sentence_index))
+                            for sentence in self._split_sentences(span.text)
+                        ])
+                segmented_paragraphs.append(segments)
+            segmented_pages.append(segmented_paragraphs)
+        
+        sentences = list(sentence_index)
+        # Sort by length so batches carry little padding
+        order = sorted(range(len(sentences)), key=lambda i: len(sentences[i]))
+        
+        if budget is not None:
+            # Each language gets a full page allowance for every page
+            budget.start_page(max(len(pages), 1) * len(target_langs))
+        
+        results = {}
+        for target_lang in target_langs:
+            print(f"Translating {len(sentences)} unique sentences to {target_lang}...")
+            greedy_ids: Set[int] = set()
             
-            if original_content.strip():
-                print(f"Translating paragraph ({len(original_content)} chars)...")
-                translated_content = self.translate_content(original_content)
-                translated_para["content"] = translated_content
-                translated_para["original_content"] = original_content
+            def translate_batch(ids: List[int]) -> List[str]:
+                # Falling back to greedy only changes anything when beam search is on
+                greedy = self.num_beams > 1 and budget is not None and budget.should_degrade()
+                if greedy:
+                    greedy_ids.update(ids)
+                return self._translate_batch([sentences[j] for j in ids], target_lang, greedy)
             
-            translated_paragraphs.append(translated_para)
-        
-        return translated_paragraphs
+            translated = [""] * len(sentences)
+            batch_out = self.batcher.run(order, translate_batch, length=lambda j: len(sentences[j]))
+            for j, text in zip(order, batch_out):
+                translated[j] = text
+            
+            translated_pages = []
+            for page, segmented_paragraphs in zip(pages, segmented_pages):
+                translated_paragraphs = []
+                for para, segments in zip(page.paragraphs, segmented_paragraphs):
+                    spans = [
+                        Span(TEXT, ' '.join(translated[j] for j in ids)) if ids else span
+                        for span, ids in zip(para.spans, segments)
+                    ]
+                    translated_paragraphs.append(para.with_spans(spans))
+                translated_page = page.with_paragraphs(translated_paragraphs)
+                # Only pages containing a greedily decoded sentence are degraded
+                if greedy_ids and any(
+                    j in greedy_ids
+                    for segments in segmented_paragraphs for ids in segments if ids
+                    for j in ids
+                ):
+                    translated_page.mark_degraded(GREEDY_DECODING)
+                translated_pages.append(translated_page)
+            results[target_lang] = translated_pages
+        
+        if budget is not None:
+            budget.end_page()
+        
+        return results
@@ -0,0 +1,65 @@
+from pathlib import Path
+
+import pytest
+
+batch = pytest.importorskip("batch")
+
+
+def _touch(path: Path) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"%PDF-1.4\n")
+    return path
+
+
+def _runner(output_dir: Path, langs=("kor_Hang",)):
+    # plan() needs no models
+    runner = batch.BatchRunner.__new__(batch.BatchRunner)
+    runner.output_dir = output_dir
+    runner.checkpoint_dir = output_dir / ".checkpoints"
+    runner.target_langs = list(langs)
+    runner.force = False
+    runner.stats = {"documents_total": 0, "documents_skipped": 0}
+    return runner
+
+
+def test_directory_keeps_relative_names_and_skips_output_dir(tmp_path):
+    _touch(tmp_path / "a" / "report.pdf")
+    _touch(tmp_path / "b" / "report.pdf")
+    _touch(tmp_path / "out" / "a" / "report_kor_Hang.pdf")
+
+    inputs = batch.collect_inputs(tmp_path, exclude=tmp_path / "out")
+    assert [name for _, name in inputs] == ["a/report", "b/report"]
+
+
+def test_manifest_names_are_unique(tmp_path):
+    manifest_dir = tmp_path / "jobs"
+    _touch(manifest_dir / "a" / "report.pdf")
+    _touch(manifest_dir / "b" / "report.pdf")
+    outside = _touch(tmp_path / "elsewhere" / "report.pdf")
+    manifest = manifest_dir / "manifest.txt"
+    manifest.write_text(f"# inputs\na/report.pdf\nb/report.pdf  # same stem\n\n{outside}\n", encoding="utf-8")
+
+    names = [name for _, name in batch.collect_inputs(manifest)]
+    assert names[:2] == ["a/report", "b/report"]
+    assert names[2].startswith("report_") and len(set(names)) == 3
+
+
+def test_plan_skips_repeated_entries_and_completed_outputs(tmp_path):
+    output_dir = tmp_path / "out"
+    done = _touch(tmp_path / "done.pdf")
+    _touch(output_dir / "done_kor_Hang.pdf")
+    todo = _touch(tmp_path / "todo.pdf")
+
+    runner = _runner(output_dir)
+    documents = runner.plan([(todo, "todo"), (done, "done"), (tmp_path / "." / "todo.pdf", "todo")])
+    assert [doc.input_path for doc in documents] == [todo]
+    assert documents[0].output_paths == {"kor_Hang": output_dir / "todo_kor_Hang.pdf"}
+    assert documents[0].checkpoint_path == output_dir / ".checkpoints" / "todo.ocr.bin"
+    assert runner.stats == {"documents_total": 2, "documents_skipped": 1}
+
+
+def test_plan_rejects_name_collisions(tmp_path):
+    first = _touch(tmp_path / "a.pdf")
+    second = _touch(tmp_path / "b.pdf")
+    with pytest.raises(ValueError):
+        _runner(tmp_path / "out").plan([(first, "same"), (second, "same")])
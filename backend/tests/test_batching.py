@@ -0,0 +1,126 @@
+import os
+import types
+
+import pytest
+
+from utils import batching
+from utils.batching import AdaptiveBatchController, is_out_of_memory, _host_memory_used_fraction
+
+
+@pytest.fixture(autouse=True)
+def quiet_host(monkeypatch):
+    # Plenty of threads and free memory unless a test says otherwise
+    monkeypatch.setattr(os, "cpu_count", lambda: 64)
+    monkeypatch.setattr(batching, "_host_memory_used_fraction", lambda: 0.1)
+
+
+def _recording(sizes, fail_above=None):
+    def fn(batch):
+        sizes.append(len(batch))
+        if fail_above is not None and len(batch) > fail_above:
+            raise MemoryError("out of memory")
+        return [item.upper() for item in batch]
+    return fn
+
+
+def test_full_batches_grow_up_to_max():
+    controller = AdaptiveBatchController("cpu", initial_size=2, max_size=16)
+    sizes = []
+    items = ["x"] * 40
+    assert controller.run(items, _recording(sizes)) == ["X"] * 40
+    assert sizes == [2, 4, 8, 16, 10]
+    assert controller.batch_size(controller.bucket(1)) == 16
+
+
+def test_oom_splits_batch_and_remembers_ceiling():
+    controller = AdaptiveBatchController("cpu", initial_size=8, max_size=64)
+    sizes = []
+    items = [f"s{i}" for i in range(8)]
+    assert controller.run(items, _recording(sizes, fail_above=4)) == [item.upper() for item in items]
+    assert sizes == [8, 4, 4]
+
+    bucket = controller.bucket(2)
+    # Growth bisects towards the failing size instead of jumping back to it
+    assert controller.batch_size(bucket) == 6
+    assert controller._ceilings[bucket] == 8
+
+
+def test_ceiling_carries_over_to_longer_buckets():
+    controller = AdaptiveBatchController("cpu", initial_size=8, max_size=64)
+    controller.run(["s"] * 8, _recording([], fail_above=4))
+    assert controller.batch_size(controller.bucket(1000)) == 7
+    assert controller.batch_size(controller.bucket(1)) == 6
+
+
+def test_single_item_oom_and_other_errors_propagate():
+    controller = AdaptiveBatchController("cpu", initial_size=4, max_size=64)
+    with pytest.raises(MemoryError):
+        controller.run(["x"] * 4, _recording([], fail_above=0))
+
+    def broken(batch):
+        raise KeyError("bad input")
+
+    with pytest.raises(KeyError):
+        controller.run(["x"] * 4, broken)
+
+
+def test_shrinks_when_over_memory_target(monkeypatch):
+    monkeypatch.setattr(batching, "_host_memory_used_fraction", lambda: 0.95)
+    controller = AdaptiveBatchController("cpu", initial_size=8, max_size=64)
+    sizes = []
+    controller.run(["x"] * 20, _recording(sizes))
+    assert sizes[:3] == [8, 6, 4]
+
+
+def test_cpu_caps_batch_size_by_threads(monkeypatch):
+    monkeypatch.setattr(os, "cpu_count", lambda: 2)
+    controller = AdaptiveBatchController("cpu", initial_size=32, max_size=64)
+    assert controller.max_size == 2 * batching.CPU_BATCH_SIZE_PER_THREAD
+    assert controller.initial_size == controller.max_size
+
+
+def test_is_out_of_memory():
+    assert is_out_of_memory(MemoryError())
+    assert is_out_of_memory(RuntimeError("CUDA out of memory. Tried to allocate"))
+    assert is_out_of_memory(RuntimeError("ResourceExhausted: Out of memory error on GPU 0"))
+    assert not is_out_of_memory(ValueError("bad shape"))
+
+
+def test_host_memory_from_meminfo(tmp_path):
+    meminfo = tmp_path / "meminfo"
+    meminfo.write_text(
+        "MemTotal:       16000000 kB\n"
+        "MemFree:         1000000 kB\n"
+        "MemAvailable:   12000000 kB\n"
+        "Cached:         10000000 kB\n"
+    )
+    # Reclaimable page cache counts as available, not used
+    assert _host_memory_used_fraction(str(meminfo)) == pytest.approx(0.25)
+
+
+def test_host_memory_unknown(tmp_path):
+    meminfo = tmp_path / "meminfo"
+    meminfo.write_text("MemTotal:       16000000 kB\n")
+    assert _host_memory_used_fraction(str(meminfo)) is None
+    assert _host_memory_used_fraction(str(tmp_path / "missing")) is None
+
+
+def test_gpu_memory_counts_everything_on_the_device(monkeypatch):
+    gb = 1024 ** 3
+    cuda = types.SimpleNamespace(
+        is_available=lambda: True,
+        # 2 GB of 10 GB allocated by this process, 9 GB in use on the device
+        mem_get_info=lambda: (1 * gb, 10 * gb),
+        max_memory_allocated=lambda: 2 * gb,
+        reset_peak_memory_stats=lambda: None,
+        empty_cache=lambda: None,
+    )
+    monkeypatch.setattr(batching, "torch", types.SimpleNamespace(cuda=cuda))
+    controller = AdaptiveBatchController("cuda", initial_size=8, max_size=64)
+    assert controller.use_cuda
+    assert controller._memory_fraction() == pytest.approx(0.9)
+
+    sizes = []
+    controller.run(["x"] * 8, _recording(sizes))
+    # Over BATCH_MEMORY_TARGET, so the batch size shrinks instead of growing
+    assert controller.batch_size(controller.bucket(1)) == 6
@@ -0,0 +1,72 @@
+import types
+
+import pytest
+
+from utils import budget as budget_module
+from utils.budget import TimeBudget
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(budget_module, "time", types.SimpleNamespace(monotonic=clock.monotonic))
+    return clock
+
+
+def test_job_and_page_clocks(clock):
+    budget = TimeBudget(job_seconds=100, page_seconds=10)
+    budget.start_page(pages=2)
+    clock.now += 15
+
+    assert budget.job_remaining() == 85
+    assert budget.page_remaining() == 5
+    assert not budget.should_degrade()
+
+    clock.now += 6
+    assert budget.page_expired()
+    assert budget.should_degrade()
+    budget.end_page()
+    assert budget.last_page_over_budget
+    assert budget.page_remaining() == 10
+
+
+def test_paused_time_is_not_charged(clock):
+    budget = TimeBudget(job_seconds=100, page_seconds=10)
+    clock.now += 20
+    with budget.paused():
+        clock.now += 500
+        assert budget.job_remaining() == 80
+    assert budget.job_remaining() == 80
+    clock.now += 5
+    assert budget.job_remaining() == 75
+
+
+def test_pause_stops_the_page_clock(clock):
+    budget = TimeBudget(job_seconds=100, page_seconds=10)
+    budget.start_page()
+    clock.now += 4
+    budget.pause()
+    budget.pause()
+    clock.now += 60
+    budget.resume()
+    budget.resume()
+    assert budget.page_remaining() == 6
+    assert not budget.should_degrade()
+
+
+def test_timeout_is_capped_by_remaining_budget(clock):
+    budget = TimeBudget(job_seconds=100, page_seconds=10)
+    budget.start_page()
+    assert budget.timeout(30) == 10
+    assert budget.timeout(3) == 3
+    clock.now += 200
+    assert budget.job_expired()
+    assert budget.timeout(30) == 0.0
@@ -0,0 +1,55 @@
+import struct
+from array import array
+
+import pytest
+
+from services.document import Page, Paragraph, Span, TEXT, FORMULA, pages_to_bytes, pages_from_bytes
+
+
+def _sample_pages():
+    para = Paragraph("text", [1.0, 2.0, 3.0, 4.0], [Span(TEXT, "Hello 세계"), Span(FORMULA, "a^2")], 3)
+    translated = para.with_spans([Span(TEXT, "안녕"), Span(FORMULA, "a^2")])
+    first = Page.from_layout(1, [para], [{"label": "text", "coordinate": [1, 2, 3, 4]}])
+    second = Page(2, [translated], degradations=["low_res_ocr"])
+    return [first, second]
+
+
+def test_round_trip():
+    pages = pages_from_bytes(pages_to_bytes(_sample_pages()))
+
+    assert [page.number for page in pages] == [1, 2]
+    assert pages[0].layout_box(0) == ("text", (1.0, 2.0, 3.0, 4.0))
+    assert pages[0].paragraphs[0].content == "Hello 세계\n\n$$\na^2\n$$"
+    assert pages[0].paragraphs[0].original_spans is None
+    assert list(pages[1].paragraphs[0].bbox) == [1.0, 2.0, 3.0, 4.0]
+    assert pages[1].paragraphs[0].spans[0].text == "안녕"
+    assert pages[1].paragraphs[0].original_spans[0].text == "Hello 세계"
+    assert pages[1].degradations == ["low_res_ocr"]
+
+
+def test_format_is_little_endian():
+    page = Page(1, [], ["text"], array("f", [1.0, 2.0, 3.0, 4.0]))
+    data = pages_to_bytes([page])
+    assert struct.pack("<4f", 1.0, 2.0, 3.0, 4.0) in data
+    assert pages_from_bytes(data)[0].layout_box(0) == ("text", (1.0, 2.0, 3.0, 4.0))
+
+
+def test_rejects_other_versions():
+    data = bytearray(pages_to_bytes([Page(7, [])]))
+    data[4:6] = (2).to_bytes(2, "little")
+    with pytest.raises(ValueError):
+        pages_from_bytes(bytes(data))
+
+
+def test_truncated_data_raises_value_error():
+    data = pages_to_bytes(_sample_pages())
+    for length in range(len(data)):
+        with pytest.raises(ValueError):
+            pages_from_bytes(data[:length])
+
+
+def test_rejects_unknown_data():
+    with pytest.raises(ValueError):
+        pages_from_bytes(b"NOPE" + bytes(16))
+    with pytest.raises(ValueError):
+        pages_from_bytes(pages_to_bytes(_sample_pages()) + b"\0")
@@ -0,0 +1,33 @@
+import os
+
+import pytest
+
+reportlab = pytest.importorskip("reportlab")
+pytest.importorskip("PIL")
+
+from services import pdf_generator
+
+
+@pytest.fixture
+def candidates(monkeypatch, tmp_path):
+    broken = tmp_path / "broken.ttc"
+    broken.write_bytes(b"not a font")
+    monkeypatch.setattr(pdf_generator, "_font_names", {})
+
+    def set_candidates(*paths):
+        monkeypatch.setitem(pdf_generator.FONT_CANDIDATES, "test_Lang", [(str(p), 0) for p in paths])
+
+    return broken, set_candidates
+
+
+def test_unloadable_font_falls_through_to_next_candidate(candidates):
+    broken, set_candidates = candidates
+    vera = os.path.join(os.path.dirname(reportlab.__file__), "fonts", "Vera.ttf")
+    set_candidates(broken, "/nonexistent/font.ttf", vera)
+    assert pdf_generator._register_font("test_Lang") == "CJK-test_Lang"
+
+
+def test_helvetica_when_no_candidate_loads(candidates):
+    broken, set_candidates = candidates
+    set_candidates(broken)
+    assert pdf_generator._register_font("test_Lang") == "Helvetica"
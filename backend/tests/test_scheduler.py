@@ -0,0 +1,168 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from services.scheduler import Job, JobScheduler, QueueFullError
+
+
+def _job(job_id, client_id, steps=1, priority=0, log=None, step_seconds=0.0):
+    def run():
+        for _ in range(steps):
+            if log is not None:
+                log.append(job_id)
+            time.sleep(step_seconds)
+            yield
+
+    return Job(job_id, client_id, run(), num_pages=steps, total_steps=steps, priority=priority)
+
+
+def _scheduler(**kwargs):
+    kwargs.setdefault("aging_seconds", 3600)
+    return JobScheduler(**kwargs)
+
+
+def test_higher_priority_first():
+    scheduler = _scheduler()
+    scheduler.submit(_job("low", "a"))
+    scheduler.submit(_job("high", "b", priority=5))
+    assert [job.job_id for job in scheduler._ordered_jobs()] == ["high", "low"]
+
+
+def test_shortest_job_first():
+    scheduler = _scheduler()
+    scheduler.submit(_job("long", "a", steps=50))
+    scheduler.submit(_job("short", "b", steps=2))
+    assert scheduler._next_job().job_id == "short"
+
+
+def test_fair_share_prefers_less_used_client():
+    scheduler = _scheduler()
+    scheduler.submit(_job("heavy", "a", steps=1))
+    scheduler.submit(_job("light", "b", steps=10))
+    scheduler._charge("a", 5.0)
+    assert scheduler._next_job().job_id == "light"
+
+
+def test_waiting_jobs_age_into_higher_priority():
+    scheduler = _scheduler(aging_seconds=10)
+    old = _job("old", "a")
+    old.last_run -= 25
+    scheduler.submit(old)
+    scheduler.submit(_job("new", "b", priority=1))
+    assert scheduler._next_job().job_id == "old"
+
+
+def test_client_quota():
+    scheduler = _scheduler(max_jobs_per_client=2)
+    scheduler.submit(_job("1", "a"))
+    scheduler.submit(_job("2", "a"))
+    with pytest.raises(QueueFullError):
+        scheduler.submit(_job("3", "a"))
+    scheduler.submit(_job("4", "b"))
+
+
+def test_queue_position_and_eta():
+    scheduler = _scheduler(workers=1)
+    scheduler.seconds_per_step = 2.0
+    running = _job("running", "a", steps=5)
+    running.running = True
+    scheduler.submit(running)
+    scheduler.submit(_job("first", "b", steps=3))
+    scheduler.submit(_job("second", "c", steps=4))
+
+    assert scheduler.queue_info("running") == {"queue_position": 0, "eta_seconds": 10.0}
+    # 5 running steps + 3 ahead in the queue + 4 own steps
+    assert scheduler.queue_info("second") == {"queue_position": 2, "eta_seconds": 24.0}
+    assert scheduler.queue_info("unknown") is None
+
+
+def test_long_job_is_preempted_by_short_one():
+    log = []
+    errors = []
+
+    async def run():
+        scheduler = _scheduler(workers=1)
+        scheduler.start()
+        scheduler.submit(_job("long", "a", steps=4, log=log, step_seconds=0.05))
+        await asyncio.sleep(0.01)
+        scheduler.submit(_job("short", "b", steps=1, log=log))
+        failing = _job("failing", "c")
+        failing.steps = iter(lambda: 1 / 0, None)
+        failing.on_error = errors.append
+        scheduler.submit(failing)
+        for _ in range(200):
+            if not scheduler.jobs:
+                break
+            await asyncio.sleep(0.01)
+        await scheduler.stop()
+        return scheduler
+
+    scheduler = asyncio.run(run())
+    assert not scheduler.jobs
+    assert log.count("long") == 4
+    # The short job runs as soon as the long one's first page is done
+    assert log == ["long", "short", "long", "long", "long"]
+    assert isinstance(errors[0], ZeroDivisionError)
+
+
+def test_hostile_client_cannot_starve_small_jobs():
+    # Untrusted uploads always get priority 0; flooding the queue with
+    # long jobs must not delay another client's short job
+    scheduler = _scheduler(max_jobs_per_client=10)
+    for i in range(10):
+        scheduler.submit(_job(f"book{i}", "hog", steps=300))
+    scheduler._charge("hog", 40.0)
+    scheduler.submit(_job("paper", "victim", steps=5))
+
+    assert scheduler._next_job().job_id == "paper"
+    with pytest.raises(QueueFullError):
+        scheduler.submit(_job("book10", "hog", steps=300))
+
+
+def test_hostile_client_while_running():
+    log = []
+
+    async def run():
+        scheduler = _scheduler(workers=1, max_jobs_per_client=10)
+        scheduler.start()
+        for i in range(3):
+            scheduler.submit(_job(f"book{i}", "hog", steps=20, log=log, step_seconds=0.01))
+        await asyncio.sleep(0.05)
+        scheduler.submit(_job("paper", "victim", steps=2, log=log, step_seconds=0.01))
+        for _ in range(500):
+            if not scheduler.jobs:
+                break
+            await asyncio.sleep(0.01)
+        await scheduler.stop()
+
+    asyncio.run(run())
+    first = log.index("paper")
+    # The paper starts after the step running when it arrived and is not
+    # interrupted by the hog's remaining 50-odd steps
+    assert first < 15
+    assert log[first:first + 2] == ["paper", "paper"]
+
+
+def test_steps_run_on_the_schedulers_own_threads():
+    threads = set()
+
+    def steps():
+        for _ in range(3):
+            threads.add(threading.current_thread().name)
+            yield
+
+    async def run():
+        scheduler = _scheduler(workers=1)
+        scheduler.start()
+        scheduler.submit(Job("job", "a", steps(), num_pages=3, total_steps=3))
+        for _ in range(100):
+            if not scheduler.jobs:
+                break
+            await asyncio.sleep(0.01)
+        await scheduler.stop()
+
+    asyncio.run(run())
+    assert len(threads) == 1
+    assert next(iter(threads)).startswith("job-step")
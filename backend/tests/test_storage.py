@@ -0,0 +1,89 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+from utils.storage import StorageJanitor, parse_range_header, iter_file_range, touch
+
+
+def test_no_header_serves_whole_file():
+    assert parse_range_header(None, 100) is None
+    assert parse_range_header("", 100) is None
+
+
+def test_closed_range():
+    assert parse_range_header("bytes=0-9", 100) == (0, 9)
+
+
+def test_open_ended_range():
+    assert parse_range_header("bytes=90-", 100) == (90, 99)
+
+
+def test_end_is_clamped_to_file_size():
+    assert parse_range_header("bytes=50-500", 100) == (50, 99)
+
+
+def test_suffix_range():
+    assert parse_range_header("bytes=-10", 100) == (90, 99)
+    assert parse_range_header("bytes=-500", 100) == (0, 99)
+
+
+def test_last_before_first_is_ignored():
+    assert parse_range_header("bytes=5-3", 100) is None
+
+
+@pytest.mark.parametrize("header", ["items=0-9", "bytes=0-9,20-29", "bytes=abc", "bytes=a-b", "bytes=-"])
+def test_unsupported_or_malformed_ranges_are_ignored(header):
+    assert parse_range_header(header, 100) is None
+
+
+@pytest.mark.parametrize("header", ["bytes=100-", "bytes=200-300", "bytes=-0"])
+def test_unsatisfiable_ranges(header):
+    with pytest.raises(ValueError):
+        parse_range_header(header, 100)
+
+
+def test_iter_file_range(tmp_path):
+    path = tmp_path / "data.bin"
+    path.write_bytes(bytes(range(256)))
+
+    async def read():
+        return b"".join([chunk async for chunk in iter_file_range(str(path), 10, 19)])
+
+    assert asyncio.run(read()) == bytes(range(10, 20))
+
+
+def _write(path, size, written_at):
+    path.write_bytes(b"x" * size)
+    os.utime(path, (written_at, written_at))
+
+
+def test_downloads_do_not_postpone_expiry(tmp_path):
+    now = time.time()
+    old = tmp_path / "old.pdf"
+    _write(old, 10, now - 3 * 3600)
+    touch(str(old))
+
+    janitor = StorageJanitor([tmp_path], max_age_hours=2, quota_bytes=1000)
+    assert janitor.sweep() == [old]
+
+
+def test_quota_evicts_least_recently_used(tmp_path):
+    now = time.time()
+    downloaded = tmp_path / "downloaded.pdf"
+    untouched = tmp_path / "untouched.pdf"
+    protected = tmp_path / "protected.pdf"
+    _write(downloaded, 10, now - 300)
+    _write(protected, 10, now - 300)
+    _write(untouched, 10, now - 200)
+    touch(str(downloaded))
+
+    evicted = []
+    janitor = StorageJanitor(
+        [tmp_path], max_age_hours=1, quota_bytes=20,
+        is_protected=lambda path: path == protected, on_evict=evicted.append
+    )
+    assert janitor.sweep() == [untouched]
+    assert evicted == [untouched]
+    assert downloaded.exists() and protected.exists()
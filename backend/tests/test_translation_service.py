@@ -0,0 +1,93 @@
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from services.document import Page, Paragraph, Span, TEXT, FORMULA
+from services.translation_service import TranslationService
+from utils.batching import AdaptiveBatchController
+from utils.budget import TimeBudget, GREEDY_DECODING
+
+
+class StubTranslationService(TranslationService):
+    """translate_pages with a recording stand-in for the model"""
+
+    def __init__(self, num_beams=1):
+        self.num_beams = num_beams
+        self.batcher = AdaptiveBatchController("cpu", 4, 64)
+        self.calls = []
+
+    def _translate_batch(self, texts, target_lang="kor_Hang", greedy=False):
+        self.calls.append((target_lang, list(texts), greedy))
+        return [f"<{target_lang}:{text}>" for text in texts]
+
+
+def _page(number, *spans):
+    return Page(number, [Paragraph("text", [0, 0, 10, 10], list(spans), len(spans))])
+
+
+def test_sentences_are_translated_once_per_language():
+    pages = [
+        _page(1, Span(TEXT, "Hello world. Short one."), Span(FORMULA, "E = mc^2")),
+        _page(2, Span(TEXT, "Short one. Hello world.")),
+    ]
+    service = StubTranslationService()
+    results = service.translate_pages(pages, ["kor_Hang", "jpn_Jpan"])
+
+    for lang in ("kor_Hang", "jpn_Jpan"):
+        sentences = [text for call_lang, texts, _ in service.calls if call_lang == lang for text in texts]
+        assert sorted(sentences) == ["Hello world.", "Short one."]
+
+    first = results["kor_Hang"][0].paragraphs[0]
+    assert first.spans[0].text == "<kor_Hang:Hello world.> <kor_Hang:Short one.>"
+    assert first.spans[1].kind == FORMULA and first.spans[1].text == "E = mc^2"
+    assert first.original_spans[0].text == "Hello world. Short one."
+    assert results["jpn_Jpan"][1].paragraphs[0].spans[0].text == "<jpn_Jpan:Short one.> <jpn_Jpan:Hello world.>"
+    assert all(not page.degradations for lang_pages in results.values() for page in lang_pages)
+
+
+def test_source_pages_are_left_untouched():
+    pages = [_page(1, Span(TEXT, "Hello world."))]
+    StubTranslationService().translate_pages(pages, ["kor_Hang"])
+    assert pages[0].paragraphs[0].spans[0].text == "Hello world."
+    assert pages[0].paragraphs[0].original_spans is None
+
+
+class ExpiringBudget(TimeBudget):
+    """Budget that runs out once a number of batches have been translated"""
+
+    def __init__(self, service, batches_allowed):
+        super().__init__(job_seconds=3600, page_seconds=60)
+        self.service = service
+        self.batches_allowed = batches_allowed
+
+    def should_degrade(self):
+        return len(self.service.calls) >= self.batches_allowed
+
+
+def test_only_pages_with_greedy_sentences_are_marked():
+    pages = [
+        _page(1, Span(TEXT, "A short sentence.")),
+        _page(2, Span(TEXT, "A much longer sentence that sorts after the short one.")),
+        _page(3, Span(FORMULA, "x^2")),
+    ]
+    service = StubTranslationService(num_beams=4)
+    service.batcher = AdaptiveBatchController("cpu", 1, 1)
+    results = service.translate_pages(pages, ["kor_Hang"], ExpiringBudget(service, batches_allowed=1))
+
+    assert [greedy for _, _, greedy in service.calls] == [False, True]
+    assert [page.degradations for page in results["kor_Hang"]] == [[], [GREEDY_DECODING], []]
+
+
+def test_no_greedy_fallback_without_beam_search():
+    pages = [_page(1, Span(TEXT, "One. Two."))]
+    service = StubTranslationService(num_beams=1)
+    results = service.translate_pages(pages, ["kor_Hang"], ExpiringBudget(service, batches_allowed=0))
+    assert not any(greedy for _, _, greedy in service.calls)
+    assert results["kor_Hang"][0].degradations == []
+
+
+def test_page_allowance_covers_every_language():
+    budget = TimeBudget(job_seconds=3600, page_seconds=60)
+    StubTranslationService().translate_pages([_page(1, Span(TEXT, "Hi."))] * 2, ["kor_Hang", "jpn_Jpan", "zho_Hans"], budget)
+    assert budget.page_allowance == 60 * 2 * 3
@@ -0,0 +1,237 @@
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from config import (
+    BATCH_MEMORY_TARGET, BATCH_LATENCY_TARGET_SECONDS, CPU_BATCH_SIZE_PER_THREAD, MIN_LENGTH_BUCKET
+)
+
+try:
+    import torch
+except ImportError:
+    torch = None
+
+
+def is_out_of_memory(e: BaseException) -> bool:
+    """Check if an exception is a GPU or host out-of-memory error"""
+    if isinstance(e, MemoryError):
+        return True
+    if torch is not None and isinstance(e, getattr(torch.cuda, "OutOfMemoryError", ())):
+        return True
+    message = str(e).lower()
+    return "out of memory" in message or "resourceexhausted" in message.replace(" ", "")
+
+
+def _cuda_available(device: str) -> bool:
+    return (
+        device.split(":")[0] in ("cuda", "gpu")
+        and torch is not None
+        and torch.cuda.is_available()
+    )
+
+
+def _host_memory_used_fraction(meminfo_path: str = "/proc/meminfo") -> Optional[float]:
+    """
+    Fraction of physical RAM that is not available, or None if unknown
+
+    Uses MemAvailable rather than free pages, since the page cache
+    (e.g. recently read model weights) can be reclaimed on demand.
+    """
+    fields = {}
+    try:
+        with open(meminfo_path) as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in ("MemTotal", "MemAvailable"):
+                    fields[key] = int(value.split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    total = fields.get("MemTotal", 0)
+    if total <= 0 or "MemAvailable" not in fields:
+        return None
+    return 1.0 - fields["MemAvailable"] / total
+
+
+def release_cached_memory():
+    """Return cached GPU memory to the driver after an out-of-memory error"""
+    if torch is not None and torch.cuda.is_available():
+        torch.cuda.empty_cache()
+    paddle = sys.modules.get("paddle")
+    if paddle is not None:
+        try:
+            paddle.device.cuda.empty_cache()
+        except Exception:
+            pass
+
+
+def initial_batch_size(device: str, default: int, max_size: int, items_per_gb: float) -> int:
+    """
+    Pick a starting batch size from the device's free memory / thread count
+
+    Args:
+        device: "cuda", "gpu", "gpu:0", "cpu", ...
+        default: Size used when nothing can be measured
+        max_size: Upper bound
+        items_per_gb: Batch items to allow per GB of free GPU memory
+
+    Returns:
+        Batch size between 1 and max_size
+    """
+    if _cuda_available(device):
+        try:
+            free, _ = torch.cuda.mem_get_info()
+            size = int(free / 1024 ** 3 * items_per_gb)
+        except Exception:
+            size = default
+    else:
+        size = (os.cpu_count() or 1) * CPU_BATCH_SIZE_PER_THREAD
+    return max(1, min(size, max_size))
+
+
+class AdaptiveBatchController:
+    """
+    Memory-aware dynamic batch sizing
+
+    Batch sizes are tracked per input-length bucket (powers of two). After
+    a full batch that stayed under the memory and latency targets, the
+    bucket's size doubles (bisecting towards any size known to fail); an
+    out-of-memory error halves it, remembers the failing size as a
+    ceiling, and the batch is retried in two halves instead of failing
+    the job. On CPU the limits are host RAM and the
+    thread count.
+    """
+
+    def __init__(
+        self,
+        device: str,
+        initial_size: int,
+        max_size: int,
+        memory_target: float = BATCH_MEMORY_TARGET,
+        latency_target: float = BATCH_LATENCY_TARGET_SECONDS,
+    ):
+        """
+        Args:
+            device: Device the work runs on ("cuda" or "cpu")
+            initial_size: Starting batch size for a new bucket
+            max_size: Upper bound on any batch size
+            memory_target: Max fraction of device (or host) memory to use
+            latency_target: Max seconds per batch before growth stops
+        """
+        self.use_cuda = _cuda_available(device)
+        if not self.use_cuda:
+            max_size = min(max_size, (os.cpu_count() or 1) * CPU_BATCH_SIZE_PER_THREAD)
+        self.max_size = max(max_size, 1)
+        self.initial_size = max(min(initial_size, self.max_size), 1)
+        self.memory_target = memory_target
+        self.latency_target = latency_target
+        self._sizes: Dict[int, int] = {}
+        self._ceilings: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, length: int) -> int:
+        """Length bucket: the next power of two, at least MIN_LENGTH_BUCKET"""
+        bucket = MIN_LENGTH_BUCKET
+        while bucket < length:
+            bucket *= 2
+        return bucket
+
+    def batch_size(self, bucket: int) -> int:
+        """Current batch size for a length bucket"""
+        with self._lock:
+            return self._current_size(bucket)
+
+    def _current_size(self, bucket: int) -> int:
+        size = self._sizes.get(bucket)
+        if size is None:
+            # Longer inputs never get more than a shorter bucket's ceiling allows
+            size = self.initial_size
+            for other, ceiling in self._ceilings.items():
+                if other <= bucket:
+                    size = min(size, max(ceiling - 1, 1))
+        return size
+
+    def run(self, items: Sequence, fn: Callable[[List], List], length: Callable = len) -> List:
+        """
+        Apply fn to items in adaptively sized batches
+
+        Items should be sorted by length so batches have little padding.
+
+        Args:
+            items: Inputs
+            fn: Processes a list of inputs, returns one output per input
+            length: Input length measure used for bucketing
+
+        Returns:
+            Outputs in input order
+        """
+        results = []
+        i = 0
+        while i < len(items):
+            size = self.batch_size(self.bucket(length(items[i])))
+            batch = list(items[i:i + size])
+            # The longest item decides the bucket of the whole batch
+            longest = self.bucket(max(length(item) for item in batch))
+            batch = batch[:self.batch_size(longest)]
+            results.extend(self._execute(batch, fn, longest))
+            i += len(batch)
+        return results
+
+    def _execute(self, batch: List, fn: Callable[[List], List], bucket: int) -> List:
+        if self.use_cuda:
+            torch.cuda.reset_peak_memory_stats()
+        started = time.monotonic()
+        out_of_memory = False
+        try:
+            outputs = fn(batch)
+        except Exception as e:
+            if not is_out_of_memory(e) or len(batch) == 1:
+                raise
+            out_of_memory = True
+        
+        if out_of_memory:
+            # Retry outside the except block: the traceback keeps the failed
+            # batch's tensors alive until the exception is released
+            self._record_oom(bucket, len(batch))
+            print(f"Out of memory with batch size {len(batch)} (bucket {bucket}), splitting batch")
+            mid = len(batch) // 2
+            return self._execute(batch[:mid], fn, bucket) + self._execute(batch[mid:], fn, bucket)
+        self._record_success(bucket, len(batch), time.monotonic() - started)
+        return outputs
+
+    def _memory_fraction(self) -> Optional[float]:
+        if self.use_cuda:
+            try:
+                # Device-wide use covers memory outside this batch (OCR models,
+                # torch's cached blocks, other processes); the peak covers
+                # memory the batch freed before returning
+                free, total = torch.cuda.mem_get_info()
+                return max(1.0 - free / total, torch.cuda.max_memory_allocated() / total)
+            except Exception:
+                return None
+        return _host_memory_used_fraction()
+
+    def _record_success(self, bucket: int, size: int, seconds: float):
+        memory = self._memory_fraction()
+        with self._lock:
+            current = self._current_size(bucket)
+            # Only full batches say anything about headroom
+            if size < current:
+                return
+            if seconds > self.latency_target or (memory is not None and memory > self.memory_target):
+                self._sizes[bucket] = max(size * 3 // 4, 1)
+                return
+            grown = min(size * 2, self.max_size)
+            ceiling = self._ceilings.get(bucket)
+            if ceiling is not None:
+                # Bisect between the last good size and the smallest OOM size
+                grown = min(grown, (size + ceiling) // 2)
+            self._sizes[bucket] = max(grown, size, 1)
+
+    def _record_oom(self, bucket: int, size: int):
+        if self.use_cuda:
+            torch.cuda.empty_cache()
+        with self._lock:
+            self._ceilings[bucket] = min(self._ceilings.get(bucket, size), size)
+            self._sizes[bucket] = max(size // 2, 1)
@@ -0,0 +1,100 @@
+import os
+import time
+from contextlib import contextmanager
+from typing import Optional
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from config import JOB_TIME_BUDGET_SECONDS, PAGE_TIME_BUDGET_SECONDS
+
+# Degradation markers recorded on pages
+LOW_RES_OCR = "low_res_ocr"
+GREEDY_DECODING = "greedy_decoding"
+FORMULA_AS_TEXT = "formula_as_text"
+
+
+class TimeBudget:
+    """
+    Per-job and per-page time budget
+
+    The job clock starts when the budget is created. The page clock is
+    restarted by start_page() for every page of every stage (OCR,
+    translation, rendering). When a budget is exceeded, stages switch to
+    cheaper paths; should_degrade() tells them when. last_page_over_budget
+    lets a stage degrade the next page up front after a slow one.
+
+    Both clocks stop while the budget is paused (e.g. while a preempted
+    job waits for the scheduler), so only time spent working is charged.
+    """
+
+    def __init__(
+        self,
+        job_seconds: float = JOB_TIME_BUDGET_SECONDS,
+        page_seconds: float = PAGE_TIME_BUDGET_SECONDS,
+    ):
+        self.job_seconds = job_seconds
+        self.page_seconds = page_seconds
+        self.job_started = time.monotonic()
+        self.page_started: Optional[float] = None
+        self.page_allowance = page_seconds
+        self.last_page_over_budget = False
+        self.paused_at: Optional[float] = None
+
+    def _now(self) -> float:
+        # While paused, the clocks read as of the moment they were paused
+        return self.paused_at if self.paused_at is not None else time.monotonic()
+
+    def pause(self):
+        """Stop the job and page clocks"""
+        if self.paused_at is None:
+            self.paused_at = time.monotonic()
+
+    def resume(self):
+        """Restart the clocks, leaving out the time spent paused"""
+        if self.paused_at is None:
+            return
+        paused = time.monotonic() - self.paused_at
+        self.job_started += paused
+        if self.page_started is not None:
+            self.page_started += paused
+        self.paused_at = None
+
+    @contextmanager
+    def paused(self):
+        """Pause the clocks for the duration of a with block"""
+        self.pause()
+        try:
+            yield
+        finally:
+            self.resume()
+
+    def start_page(self, pages: int = 1):
+        """Restart the page clock (for a step covering the given number of pages)"""
+        self.page_started = self._now()
+        self.page_allowance = self.page_seconds * pages
+
+    def end_page(self):
+        """Stop the page clock, remembering whether the page overran"""
+        self.last_page_over_budget = self.page_remaining() <= 0
+        self.page_started = None
+
+    def job_remaining(self) -> float:
+        return self.job_seconds - (self._now() - self.job_started)
+
+    def page_remaining(self) -> float:
+        if self.page_started is None:
+            return self.page_seconds
+        return self.page_allowance - (self._now() - self.page_started)
+
+    def job_expired(self) -> bool:
+        return self.job_remaining() <= 0
+
+    def page_expired(self) -> bool:
+        return self.page_remaining() <= 0
+
+    def should_degrade(self) -> bool:
+        """True if the job or the current page is over budget"""
+        return self.job_expired() or self.page_expired()
+
+    def timeout(self, default: float) -> float:
+        """Cap a subprocess/operation timeout to what the budgets have left"""
+        return max(min(default, self.page_remaining(), self.job_remaining()), 0.0)
@@ -0,0 +1,243 @@
+import os
+import asyncio
+import time
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional, Tuple
+import aiofiles
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from config import (
+    UPLOAD_DIR, RESULT_DIR, CLEANUP_AFTER_HOURS, CLEANUP_INTERVAL_SECONDS,
+    DISK_QUOTA_BYTES, FILE_CHUNK_SIZE
+)
+
+
+async def save_upload(upload_file, dest_path: Path, max_size: int) -> int:
+    """
+    Stream an uploaded file to disk without blocking the event loop
+
+    Args:
+        upload_file: FastAPI UploadFile
+        dest_path: Destination path
+        max_size: Maximum allowed size in bytes
+
+    Returns:
+        Number of bytes written, or -1 if the file exceeded max_size
+        (the partial file is removed in that case)
+    """
+    written = 0
+    async with aiofiles.open(dest_path, "wb") as f:
+        while True:
+            chunk = await upload_file.read(FILE_CHUNK_SIZE)
+            if not chunk:
+                break
+            written += len(chunk)
+            if written > max_size:
+                break
+            await f.write(chunk)
+
+    if written > max_size:
+        try:
+            os.remove(dest_path)
+        except OSError:
+            pass
+        return -1
+    return written
+
+
+def parse_range_header(range_header: Optional[str], file_size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range HTTP Range header
+
+    Args:
+        range_header: Value of the Range header (e.g. "bytes=0-1023")
+        file_size: Size of the file in bytes
+
+    Returns:
+        (start, end) inclusive byte offsets, or None to serve the whole file
+
+    Raises:
+        ValueError: If the range starts past the end of the file (416)
+    """
+    if not range_header:
+        return None
+
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        # Unknown units and multi-range requests fall back to the full file
+        return None
+
+    start_str, sep, end_str = spec.strip().partition("-")
+    if not sep:
+        return None
+
+    if not (start_str.isdigit() or start_str == "") or not (end_str.isdigit() or end_str == ""):
+        # Malformed ranges are ignored, as allowed by RFC 9110
+        return None
+
+    if start_str == "":
+        if not end_str:
+            return None
+        # Suffix range: last N bytes
+        if int(end_str) == 0:
+            raise ValueError("Range not satisfiable")
+        start = max(file_size - int(end_str), 0)
+        end = file_size - 1
+    else:
+        start = int(start_str)
+        end = int(end_str) if end_str else file_size - 1
+        if end_str and end < start:
+            # Last position before first position is invalid, not unsatisfiable
+            return None
+
+    if start >= file_size:
+        raise ValueError("Range not satisfiable")
+
+    return start, min(end, file_size - 1)
+
+
+async def iter_file_range(path: str, start: int, end: int):
+    """Yield bytes [start, end] of a file in chunks using async I/O"""
+    remaining = end - start + 1
+    async with aiofiles.open(path, "rb") as f:
+        await f.seek(start)
+        while remaining > 0:
+            chunk = await f.read(min(FILE_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def touch(path: str):
+    """
+    Mark a file as recently used for LRU eviction
+
+    Only the access time is updated; the modification time stays the
+    file's age for the CLEANUP_AFTER_HOURS limit.
+    """
+    try:
+        os.utime(path, (time.time(), os.stat(path).st_mtime))
+    except OSError:
+        pass
+
+
+class StorageJanitor:
+    """Background cleanup of temp uploads/results with age limit and disk quota"""
+
+    def __init__(
+        self,
+        directories: Iterable[Path] = (UPLOAD_DIR, RESULT_DIR),
+        max_age_hours: float = CLEANUP_AFTER_HOURS,
+        quota_bytes: int = DISK_QUOTA_BYTES,
+        interval_seconds: float = CLEANUP_INTERVAL_SECONDS,
+        is_protected: Optional[Callable[[Path], bool]] = None,
+        on_evict: Optional[Callable[[Path], None]] = None,
+    ):
+        """
+        Args:
+            directories: Directories to keep bounded
+            max_age_hours: Files untouched for longer than this are removed
+            quota_bytes: Total size budget across all directories
+            interval_seconds: Time between sweeps
+            is_protected: Returns True for files that must not be removed
+                (e.g. inputs of jobs still being processed)
+            on_evict: Called with the path of every removed file
+        """
+        self.directories = [Path(d) for d in directories]
+        self.max_age_seconds = max_age_hours * 3600
+        self.quota_bytes = quota_bytes
+        self.interval_seconds = interval_seconds
+        self.is_protected = is_protected or (lambda path: False)
+        self.on_evict = on_evict
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the periodic sweep on the running event loop"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the periodic sweep"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                # Directory scans and unlinks are blocking, keep them off the loop
+                removed = await asyncio.to_thread(self.sweep)
+                if removed:
+                    print(f"Storage janitor removed {len(removed)} files")
+            except Exception as e:
+                print(f"Storage janitor error: {e}")
+            await asyncio.sleep(self.interval_seconds)
+
+    def sweep(self) -> List[Path]:
+        """
+        Remove expired files, then evict least recently used files until
+        the total size is within quota
+
+        Age is measured from the modification time (when the file was
+        written); recency of use is the later of access and modification
+        time, so downloads delay eviction but not expiry.
+
+        Returns:
+            List of removed file paths
+        """
+        now = time.time()
+        removed = []
+        entries = []
+
+        for directory in self.directories:
+            if not directory.exists():
+                continue
+            for path in directory.iterdir():
+                try:
+                    st = path.stat()
+                except OSError:
+                    continue
+                if not path.is_file():
+                    continue
+                entries.append((st.st_mtime, max(st.st_atime, st.st_mtime), st.st_size, path))
+
+        # Age-based cleanup
+        kept = []
+        for mtime, last_used, size, path in entries:
+            if now - mtime > self.max_age_seconds and not self.is_protected(path):
+                if self._remove(path):
+                    removed.append(path)
+                    continue
+            kept.append((last_used, size, path))
+
+        # Quota enforcement with LRU eviction (least recently used first)
+        total = sum(size for _, size, _ in kept)
+        if total > self.quota_bytes:
+            kept.sort(key=lambda e: e[0])
+            for last_used, size, path in kept:
+                if total <= self.quota_bytes:
+                    break
+                if self.is_protected(path):
+                    continue
+                if self._remove(path):
+                    removed.append(path)
+                    total -= size
+
+        return removed
+
+    def _remove(self, path: Path) -> bool:
+        try:
+            path.unlink()
+        except OSError:
+            return False
+        if self.on_evict is not None:
+            try:
+                self.on_evict(path)
+            except Exception as e:
+                print(f"Storage janitor callback error: {e}")
+        return True